@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import path_util  # noqa: F401
+
+from scraper.app.driver_supervisor import browser_rss
+from scraper.app.scraper_app import FbScraper
+from scraper.utils import driver_hooks
+from scraper.utils.driver_profiler import DriverProfiler
+from scraper.utils.fake_feed import FakeFeedServer
+from scraper.utils.pacing import Pacing
+from scraper.utils.resource_policy import ResourcePolicy
+from scraper.utils.seen_index import SeenPostIndex
+from scraper.utils.sink import JsonlPostSink
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BrowserMemorySampler:
+    # peak of browser_rss, sampled in the background while the crawl runs
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_rss = 0
+        self._driver = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self, driver):
+        self._driver = driver
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.is_alive() and self._thread.join()
+
+    def sample(self) -> int:
+        rss = browser_rss(self._driver)
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class BenchScraper(FbScraper):
+    # counts WebDriver commands and samples browser memory from the moment the driver is created
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counter = None
+        self.sampler = BrowserMemorySampler()
+        self.driver_ready_at = None
+
+    def _init_driver(self):
+        super()._init_driver()
+        self.counter = driver_hooks.install(self.driver, driver_hooks.CommandCounter)
+        self.sampler.start(self.driver)
+
+    def _open_session(self, driver, timings=None):
+        restored = super()._open_session(driver, timings)
+        if driver is self.driver:
+            self.driver_ready_at = time.perf_counter()
+        return restored
+
+
+def run_crawl(server: FakeFeedServer, args, tmp_dir: str) -> dict:
+    sink = JsonlPostSink(os.path.join(tmp_dir, "posts.jsonl"))
+    policy = ResourcePolicy() if args.block_resources else None
+    scraper = BenchScraper(page_or_group_name="bench", posts_count=args.posts, isGroup=True,
+                           headless=not args.show, timeout=args.timeout, base_url=server.base_url,
+                           profile_workers=args.profile_workers, profile_pacing=Pacing(0),
+                           profile_cache_ttl=0, scroll_pacing=Pacing(0), scroll_batch=args.scroll_batch, sink=sink,
+                           record_trace=args.record, resource_policy=policy, compact_feed=args.compact_feed,
+                           profiler=DriverProfiler(args.profile) if args.profile else None)
+    scraper.seen_index = SeenPostIndex(":memory:")
+
+    started_at = time.perf_counter()
+    try:
+        scraper.scrap_to_json()
+    finally:
+        scraper.sampler.stop()
+        sink.close()
+    finished_at = time.perf_counter()
+
+    crawl_seconds = finished_at - (scraper.driver_ready_at or started_at)
+    commands = scraper.counter.total if scraper.counter is not None else 0
+    return {
+        "posts": scraper.count,
+        "seconds": finished_at - started_at,
+        "startup_seconds": scraper.startup_latency,
+        "posts_per_second": scraper.count / max(crawl_seconds, 1e-6),
+        "commands": commands,
+        "commands_per_post": commands / max(scraper.count, 1),
+        "top_commands": scraper.counter.counts.most_common(5) if scraper.counter is not None else [],
+        "peak_browser_rss_mb": scraper.sampler.peak_rss / 1024 / 1024,
+        "seconds_per_scroll": scraper.scroll_seconds / max(scraper.scrolls, 1),
+        "downloaded_mb": policy.bytes_downloaded / 1024 / 1024 if policy is not None else None,
+        "blocked_requests": dict(policy.blocked) if policy is not None else {},
+        "server_requests": dict(server.requests),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FbScraper end to end against a local fake feed")
+    parser.add_argument("-p", "--posts", help="Count of posts to scrape", type=int, default=100)
+    parser.add_argument("-f", "--feed-size", help="Count of posts in the feed, 2 * posts by default", type=int,
+                        default=None)
+    parser.add_argument("--page-size", help="Posts loaded by one scroll", type=int, default=10)
+    parser.add_argument("--latency", help="Server latency of feed pages and profiles in seconds", type=float,
+                        default=0.05)
+    parser.add_argument("--scroll-batch", help="New posts to wait for on every scroll", type=int, default=1)
+    parser.add_argument("-pw", "--profile-workers", help="Count of browsers visiting profiles", type=int, default=0)
+    parser.add_argument("-t", "--timeout", help="Page element timeout", type=int, default=600)
+    parser.add_argument("--show", help="Run the browser with a window", action="store_true")
+    parser.add_argument("-o", "--output", help="Write the result as JSON to the file", default=None)
+    parser.add_argument("--record", help="Record the WebDriver trace of the feed driver to the file, "
+                                         "replay it with replay_crawl.py", default=None)
+    parser.add_argument("--block-resources", help="Block media, fonts and third party scripts, see ResourcePolicy",
+                        action="store_true")
+    parser.add_argument("--compact-feed", help="Empty processed feed posts, see bench_feed_memory.py",
+                        action="store_true")
+    parser.add_argument("--profile", help="Profile WebDriver commands by function, folded stacks are written to "
+                                          "the file", default=None)
+    parser.add_argument("--port", help="Port of the fake feed, fixed for a trace to be replayed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeFeedServer(posts=args.feed_size or args.posts * 2, page_size=args.page_size,
+                        latency=args.latency, port=args.port) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        result = run_crawl(server, args, tmp_dir)
+
+    logger.info(f"Crawled {result['posts']} posts in {result['seconds']:.2f}s "
+                f"(startup {result['startup_seconds'] or 0:.2f}s), {result['posts_per_second']:.2f} posts/s, "
+                f"{result['commands_per_post']:.2f} WebDriver commands per post, "
+                f"peak browser RSS {result['peak_browser_rss_mb']:.0f} MB")
+    logger.info(f"Top commands: {result['top_commands']}, server requests: {result['server_requests']}")
+    logger.info(f"{result['seconds_per_scroll']:.2f}s per scroll"
+                + (f", downloaded {result['downloaded_mb']:.2f} MB, blocked requests: {result['blocked_requests']}"
+                   if result['downloaded_mb'] is not None else ""))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fd:
+            json.dump(result, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import path_util  # noqa: F401
+
+import scraper.utils.selenium_utils as sutils
+from scraper.app.scraper_app import FbScraper, Init
+from scraper.utils import driver_hooks
+from scraper.utils.fake_feed import synthetic_feed
+from scraper.utils.seen_index import SeenPostIndex
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_engine(scraper: FbScraper, counter: driver_hooks.CommandCounter, batch: bool) -> dict:
+    scraper.batch_extract = batch
+    scraper.data_dct = {}
+    scraper.count = 0
+    scraper.visited_posts = set()
+    scraper.seen_index = SeenPostIndex(":memory:")
+    scraper.feed_cursor = 0
+    counter.reset()
+    started_at = time.perf_counter()
+    scraper._extract_posts()
+    return {
+        "engine": "batch" if batch else "per-element",
+        "posts": len(scraper.data_dct),
+        "round_trips": counter.total,
+        "seconds": time.perf_counter() - started_at,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark WebDriver round trips per extracted post")
+    parser.add_argument("-p", "--posts", help="Count of synthetic posts in the feed", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "feed.html")
+        with open(file_path, "w", encoding="utf-8") as fd:
+            fd.write(synthetic_feed(args.posts))
+
+        scraper = FbScraper(page_or_group_name="bench", posts_count=args.posts, isGroup=True)
+        scraper.driver = Init().init()
+        try:
+            scraper.driver.get(f"file://{file_path}")
+            counter = driver_hooks.install(scraper.driver, driver_hooks.CommandCounter)
+            for batch in (False, True):
+                result = run_engine(scraper, counter, batch)
+                logger.info(f"{result['engine']}: {result['posts']} posts, "
+                            f"{result['round_trips'] / max(result['posts'], 1):.2f} round trips per post, "
+                            f"{result['seconds']:.2f}s")
+        finally:
+            sutils.close_driver(scraper.driver)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import path_util  # noqa: F401
+
+import scraper.utils.selenium_utils as sutils
+from scraper.app.scraper_app import Init
+from scraper.utils import driver_hooks
+from scraper.utils.fake_feed import render_posts, synthetic_feed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def append_posts(driver, start: int, count: int):
+    # emulates one scroll of the infinite feed
+    html = render_posts(start, start + count)
+    driver.execute_script("document.querySelector(\"div[role='feed']\").insertAdjacentHTML('beforeend', arguments[0]);",
+                          html)
+
+
+def full_scan(driver) -> int:
+    # extraction before the cursor, every loaded post is handed to extraction on every scroll
+    return len(sutils.extract_posts(driver, sutils.find_all_posts(driver, True), True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark extraction cost per scroll while the feed grows")
+    parser.add_argument("-s", "--scrolls", help="Count of scrolls", type=int, default=30)
+    parser.add_argument("-p", "--posts", help="Count of posts loaded by one scroll", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "feed.html")
+        with open(file_path, "w", encoding="utf-8") as fd:
+            fd.write(synthetic_feed(0))
+
+        driver = Init().init()
+        try:
+            counter = driver_hooks.install(driver, driver_hooks.CommandCounter)
+            for engine in ("full-scan", "cursor"):
+                driver.get(f"file://{file_path}")
+                cursor = 0
+                for scroll in range(args.scrolls):
+                    append_posts(driver, scroll * args.posts, args.posts)
+                    counter.reset()
+                    started_at = time.perf_counter()
+                    if engine == "cursor":
+                        records = sutils.extract_new_posts(driver, True, cursor)
+                        cursor += len(records)
+                        extracted = len(records)
+                    else:
+                        extracted = full_scan(driver)
+                    logger.info(f"{engine} scroll {scroll + 1}: feed {(scroll + 1) * args.posts} posts, "
+                                f"extracted {extracted}, {counter.total} round trips, "
+                                f"{(time.perf_counter() - started_at) * 1000:.1f}ms")
+        finally:
+            sutils.close_driver(driver)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import time
+
+import path_util  # noqa: F401
+
+import scraper.utils.selenium_utils as sutils
+from scraper.app.driver_supervisor import browser_rss
+from scraper.app.scraper_app import Init
+from scraper.utils.fake_feed import FakeFeedServer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def crawl(server: FakeFeedServer, args, compact: bool) -> list:
+    # scrolls the feed with the cursor extraction of FbScraper, returns samples of posts, RSS and query time
+    driver = Init(headless=not args.show).init()
+    samples = []
+    try:
+        driver.get(f"{server.base_url}/groups/bench")
+        cursor = compacted = 0
+        next_sample = 0
+        while cursor < args.posts:
+            if not sutils.scroll_feed(driver, True, 1, args.timeout):
+                logger.info(f"Feed ended at {cursor} posts")
+                break
+            records = sutils.extract_new_posts(driver, True, cursor) or []
+            cursor += len(records)
+            if compact and cursor - args.margin > compacted:
+                sutils.compact_feed(driver, compacted, cursor - args.margin)
+                compacted = cursor - args.margin
+            if cursor >= next_sample:
+                started_at = time.perf_counter()
+                sutils.find_all_posts(driver, True)
+                query_ms = (time.perf_counter() - started_at) * 1000
+                samples.append({"posts": cursor, "rss_mb": browser_rss(driver) / 1024 / 1024, "query_ms": query_ms})
+                logger.info(f"{'compact' if compact else 'keep'}: {cursor} posts, "
+                            f"browser RSS {samples[-1]['rss_mb']:.0f} MB, find_all_posts {query_ms:.1f}ms")
+                next_sample = cursor + args.sample_every
+    finally:
+        sutils.close_driver(driver)
+    return samples
+
+
+def growth(samples: list) -> float:
+    # RSS growth per 1000 posts from the first to the last sample
+    if len(samples) < 2 or samples[-1]["posts"] == samples[0]["posts"]:
+        return 0.0
+    return (samples[-1]["rss_mb"] - samples[0]["rss_mb"]) * 1000 / (samples[-1]["posts"] - samples[0]["posts"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark browser memory over a long feed with and without "
+                                                 "compaction of the processed feed posts")
+    parser.add_argument("-p", "--posts", help="Count of posts to scroll", type=int, default=3000)
+    parser.add_argument("--page-size", help="Posts loaded by one scroll", type=int, default=20)
+    parser.add_argument("--sample-every", help="Posts between two memory samples", type=int, default=250)
+    parser.add_argument("--margin", help="Processed posts kept as they are", type=int, default=5)
+    parser.add_argument("-t", "--timeout", help="Seconds to wait for a page of the feed", type=int, default=10)
+    parser.add_argument("--show", help="Run the browser with a window", action="store_true")
+    parser.add_argument("-o", "--output", help="Write the samples as JSON to the file", default=None)
+    args = parser.parse_args()
+
+    result = {}
+    with FakeFeedServer(posts=args.posts + args.page_size, page_size=args.page_size) as server:
+        for mode in ("keep", "compact"):
+            samples = crawl(server, args, compact=mode == "compact")
+            result[mode] = {"samples": samples, "growth_mb_per_1000_posts": growth(samples)}
+
+    for mode, item in result.items():
+        last = item["samples"][-1] if item["samples"] else {"rss_mb": 0, "query_ms": 0}
+        logger.info(f"{mode}: final browser RSS {last['rss_mb']:.0f} MB, "
+                    f"{item['growth_mb_per_1000_posts']:.1f} MB per 1000 posts, "
+                    f"last find_all_posts {last['query_ms']:.1f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fd:
+            json.dump(result, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+import path_util  # noqa: F401
+
+from scraper.logger import log_encoder
+from scraper.logger.cli_handler import CLIHandler
+from scraper.logger.queue_handler import start_queue_logging, stop_queue_logging
+from scraper.logger.struct_logger import StructLogger, StructLogRecord
+
+FORMAT = "%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonLogRecord(StructLogRecord):
+    # record before the message cache, dict messages are encoded by json for every handler
+    def getMessage(self):
+        if "dict_msg" in self.__dict__ and isinstance(self.__dict__["dict_msg"], dict):
+            return json.dumps(self.__dict__["dict_msg"], default=log_encoder)
+        return logging.LogRecord.getMessage(self)
+
+
+def clear_handlers():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def configure(tmp_dir: str, mode: str):
+    # handlers of conf/scrapper_logs.yml: rotating file and console, the console writes to /dev/null
+    clear_handlers()
+    root = logging.getLogger()
+    file_handler = TimedRotatingFileHandler(os.path.join(tmp_dir, f"{mode}.log"), when="D", encoding="utf8")
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+    console = CLIHandler(open(os.devnull, "w"))
+    console.setLevel(logging.INFO)
+    for handler in (file_handler, console):
+        root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    logging.setLogRecordFactory(JsonLogRecord if mode == "sync-json" else StructLogRecord)
+    mode == "queue" and start_queue_logging()
+
+
+def hot_loop(logger: StructLogger, calls: int):
+    # log calls of one scroll round: progress line, debug line and a structured record
+    for i in range(calls // 3):
+        logger.info(f"Processed {i} posts 🎊 continue...")
+        logger.debug(f"Scroll loaded {i % 10} posts in {0.25:.2f}s")
+        logger.event_log({"event": "round", "found": i % 10, "accepted": i % 7, "cursor": i, "count": i * 2})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark log calls per second of the scrape loop with "
+                                                 "synchronous handlers and with the queue listener")
+    parser.add_argument("-n", "--calls", help="Log calls per mode", type=int, default=60000)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("scraper.bench_logging")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ("sync-json", "sync", "queue"):
+            configure(tmp_dir, mode)
+            started_at = time.perf_counter()
+            hot_loop(logger, args.calls)
+            caller_seconds = time.perf_counter() - started_at
+            stop_queue_logging()
+            results[mode] = (caller_seconds, time.perf_counter() - started_at)
+        clear_handlers()
+
+    logging.getLogger().addHandler(logging.StreamHandler())
+    for mode, (caller_seconds, total_seconds) in results.items():
+        logging.getLogger().info(f"{mode}: {args.calls / caller_seconds:,.0f} log calls/s in the scrape loop, "
+                                 f"{caller_seconds * 1e6 / args.calls:.1f}us per call, "
+                                 f"all records written in {total_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import aiohttp
+import path_util  # noqa: F401
+from aiohttp import web
+
+from scraper.utils.csv import upload_data
+from scraper.utils.uploader import BatchUploader
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+# per request logs of the uploaders stay quiet, the results of the benchmark are logged
+logger.setLevel(logging.INFO)
+
+
+class StandInServer:
+    # local stand-in of the ingestion server, accepts a post, JSON array or NDJSON body and fails randomly
+    def __init__(self, failure_rate: float, latency: float):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.posts = 0
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        # aiohttp decodes gzip request bodies itself
+        body = await request.read()
+        if request.content_type == "application/x-ndjson":
+            posts = [line for line in body.splitlines() if line]
+        else:
+            data = json.loads(body)
+            posts = data if isinstance(data, list) else [data]
+        self.posts += len(posts)
+        return web.json_response({"saved": len(posts)})
+
+
+def synthetic_post(i: int) -> dict:
+    return {
+        "name": f"Author {i % 50}",
+        "profile_url": f"https://facebook.com/profile.php?id={i % 50}",
+        "content": f"Synthetic post {i} " * 20,
+        "post_url": f"https://facebook.com/groups/bench/posts/{i}/",
+        "group_images": [f"https://scontent.example.com/{i}.jpg"],
+        "profile_images": [f"https://scontent.example.com/p{i % 50}.jpg"],
+        "create_at": "",
+    }
+
+
+async def run_legacy(posts, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def bound_upload(session, post):
+        async with sem:
+            await upload_data(session, post)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[bound_upload(session, post) for post in posts])
+
+
+async def run_batch(posts, args):
+    async with BatchUploader(batch_size=args.batch_size, ndjson=args.ndjson, gzip_level=args.gzip,
+                             connection_limit=args.concurrency, backoff_base=0.01) as uploader:
+        for post in posts:
+            await uploader.add(post)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark uploads against a local stand-in server")
+    parser.add_argument("-p", "--posts", type=int, default=2000)
+    parser.add_argument("-b", "--batch-size", type=int, default=50)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("--ndjson", action="store_true")
+    parser.add_argument("--gzip", type=int, default=None, help="gzip level")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.005, help="Server latency in seconds")
+    args = parser.parse_args()
+
+    server = StandInServer(args.failure_rate, args.latency)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/posts", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    os.environ["SERVER_URL"] = f"http://127.0.0.1:{port}/posts"
+    posts = [synthetic_post(i) for i in range(args.posts)]
+
+    try:
+        for name, run in (("upload_data", lambda: run_legacy(posts, args.concurrency)),
+                          ("BatchUploader", lambda: run_batch(posts, args))):
+            server.posts = server.requests = 0
+            started_at = time.perf_counter()
+            await run()
+            elapsed = time.perf_counter() - started_at
+            logger.info(f"{name}: {server.posts}/{len(posts)} posts delivered, {len(posts) / elapsed:.0f} posts/s, "
+                        f"{server.requests / len(posts):.3f} requests per post")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from os.path import isdir, join
+
+import path_util  # noqa: F401
+
+from scraper import data_path
+from scraper.utils.graphql_capture import load_fixture
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def fixture_files(paths):
+    for path in paths:
+        if isdir(path):
+            yield from sorted(glob.glob(join(path, "*.json")))
+        else:
+            yield path
+
+
+def load_expected(file_path):
+    with open(file_path, mode='r', encoding='utf-8') as fd:
+        return [json.loads(line) for line in fd if line.strip()]
+
+
+def check(posts, expected) -> bool:
+    # compares the parsed posts with the expected ones in order, every difference is logged
+    ok = len(posts) == len(expected)
+    ok or logger.error(f"Parsed {len(posts)} posts, expected {len(expected)}")
+    for post, expected_post in zip(posts, expected):
+        for field in sorted(set(post) | set(expected_post)):
+            if post.get(field) != expected_post.get(field):
+                ok = False
+                logger.error(f"Post {expected_post.get('id')} {field}: {post.get(field)!r} != "
+                             f"{expected_post.get(field)!r}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parse posts from GraphQL responses recorded by the capture mode")
+    parser.add_argument("paths", nargs="*", help="Response files or directories, default data/graphql")
+    parser.add_argument("-o", "--output", help="Output JSON lines file", default=join(data_path(), "graphql_posts.jsonl"))
+    parser.add_argument("-e", "--expected", help="Check the parsed posts against this JSON lines file, "
+                                                 "e.g. fixtures/graphql/group-feed.expected.jsonl")
+    args = parser.parse_args()
+    if args.expected:
+        # creation times are rendered in local time, expected files are written in UTC
+        os.environ["TZ"] = "UTC"
+        time.tzset()
+
+    files = list(fixture_files(args.paths or [join(data_path(), "graphql")]))
+    start_at = time.time()
+    seen = set()
+    duplicates = 0
+    posts = []
+
+    with open(args.output, "w", encoding="utf-8") as fd:
+        for file_path in files:
+            for key, post in load_fixture(file_path):
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                posts.append({"id": key, **post})
+                fd.write(json.dumps(posts[-1], ensure_ascii=False) + "\n")
+
+    elapsed = time.time() - start_at
+    logger.info(f"Parsed {len(seen)} posts ({duplicates} duplicates) from {len(files)} responses in {elapsed:.2f}s")
+    if args.expected:
+        if not check(posts, load_expected(args.expected)):
+            sys.exit(1)
+        logger.info(f"Parsed posts match {args.expected}")
+
+
+if __name__ == "__main__":
+    main()
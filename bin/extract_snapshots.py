@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import json
+import logging
+import time
+from os.path import isdir, join
+
+import path_util  # noqa: F401
+
+from scraper import data_path
+from scraper.utils.html_snapshot import extract_snapshots
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def snapshot_files(paths):
+    for path in paths:
+        if isdir(path):
+            yield from sorted(glob.glob(join(path, "*.html")))
+        else:
+            yield path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-extract posts from saved feed snapshots without a browser")
+    parser.add_argument("paths", nargs="*", help="Snapshot files or directories, default data/snapshots")
+    parser.add_argument("-o", "--output", help="Output JSON lines file", default=join(data_path(), "snapshot_posts.jsonl"))
+    parser.add_argument("-w", "--workers", help="Count of worker processes", type=int, default=None)
+    parser.add_argument("--page", help="Snapshots are taken from a page instead of a group", action="store_true")
+    args = parser.parse_args()
+
+    files = list(snapshot_files(args.paths or [join(data_path(), "snapshots")]))
+    start_at = time.time()
+    seen = set()
+
+    with open(args.output, "w", encoding="utf-8") as fd:
+        for _, posts in extract_snapshots(files, not args.page, workers=args.workers):
+            for key, post in posts.items():
+                if key in seen:
+                    continue
+                seen.add(key)
+                fd.write(json.dumps({"id": key, **post}, ensure_ascii=False) + "\n")
+
+    elapsed = time.time() - start_at
+    logger.info(f"Extracted {len(seen)} posts from {len(files)} snapshots in {elapsed:.2f}s "
+                f"({len(files) / max(elapsed, 1e-9):.0f} snapshots/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,19 @@
 #!/usr/bin/env python
 
+import argparse
 import asyncio
-import csv
 import logging
+import time
 from os.path import exists, join
 
-import aiohttp
 import path_util  # noqa: F401
 from dotenv import load_dotenv
 
 from scraper import data_path
-from scraper.utils.csv import upload_data
+from scraper.utils.csv import iter_csv_posts
+from scraper.utils.pacing import RateLimiter
+from scraper.utils.upload_ledger import UploadLedger
+from scraper.utils.uploader import BatchUploader
 
 load_dotenv()
 
@@ -18,27 +21,64 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay posts.csv to the server")
+    parser.add_argument("-f", "--file", help="CSV file to replay", default=None)
+    parser.add_argument("-s", "--start-offset", help="Count of rows to skip", type=int, default=0)
+    parser.add_argument("-c", "--concurrency", help="Count of requests in flight", type=int, default=10)
+    parser.add_argument("-b", "--batch-size", help="Posts per upload request", type=int, default=1)
+    parser.add_argument("-r", "--rate", help="Max posts per second, not limited by default", type=float, default=None)
+    parser.add_argument("--gzip", help="Compress upload requests with the gzip level", type=int, default=None)
+    parser.add_argument("--progress-every", help="Log progress every N rows", type=int, default=1000)
+    parser.add_argument("--only-failures", help="Replay only the posts whose upload failed before",
+                        action="store_true")
+    parser.add_argument("--force", help="Send posts already uploaded with the same content", action="store_true")
+    return parser.parse_args()
+
+
 async def run_application() -> None:
-    root_path = data_path()
-    file_path = join(root_path, "posts.csv")
+    args = parse_args()
+    file_path = args.file or join(data_path(), "posts.csv")
 
     try:
         if not exists(file_path):
             raise FileNotFoundError("File not found")
 
-        async with aiohttp.ClientSession() as session:
-            with open(file_path, 'r', newline='', encoding="utf-8") as fd:
-                reader = csv.DictReader(fd)
-                data = [row for row in reader]
+        ledger = UploadLedger()
+        try:
+            posts = iter_csv_posts(file_path, args.start_offset)
+            if args.only_failures:
+                posts = ledger.requeue_failures(posts)
+            limiter = RateLimiter(args.rate, burst=max(args.batch_size, 1)) if args.rate else None
+            started_at = time.time()
+            replayed = 0
+            # the uploader waits for a free connection slot, so rows are read only as fast as they are sent
+            async with BatchUploader(batch_size=args.batch_size, gzip_level=args.gzip,
+                                     connection_limit=args.concurrency, on_result=ledger.on_result) as uploader:
+                for key, post in posts:
+                    replayed += 1
+                    # posts already delivered with the same content are skipped
+                    if ledger.should_send(key, post, force=args.force):
+                        if limiter is not None:
+                            await limiter.acquire()
+                        await uploader.add({"id": key, **post}, key)
+                    if replayed % args.progress_every == 0:
+                        elapsed = time.time() - started_at
+                        logger.info(f"Read {replayed} rows, {replayed / elapsed:.1f} rows/s, uploaded {uploader.sent}, "
+                                    f"failed {uploader.failed}, skipped {ledger.skipped}")
 
-            tasks = [upload_data(session, row) for row in data]
-            await asyncio.gather(*tasks)
-            logger.info("Done!")
+            elapsed = time.time() - started_at
+            logger.info(f"Done! Replayed {replayed} rows in {elapsed:.1f}s ({replayed / max(elapsed, 1e-6):.1f} rows/s), "
+                        f"uploaded {uploader.sent}, failed {uploader.failed}, skipped {ledger.skipped}")
+            if not args.only_failures:
+                logger.info(f"Next offset {args.start_offset + replayed}")
+        finally:
+            # the ledger keeps the results of the batches sent before a failure
+            ledger.close()
 
     except Exception as ex:
         logger.error(f'Error at read csv file {file_path}: {ex}')
 
 
 if __name__ == "__main__":
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run_application())
+    asyncio.run(run_application())
@@ -2,27 +2,103 @@
 
 import argparse
 import asyncio
-import json
+import functools
 import logging
 import os
+import signal
+import threading
 import time
 
-import aiohttp
 import path_util  # noqa: F401
 from dotenv import load_dotenv
 
 from scraper import init_logging
+from scraper.app.checkpoint import Checkpoint
+from scraper.app.driver_supervisor import DriverSupervisor
+from scraper.app.orchestrator import Orchestrator, load_targets
 from scraper.app.scraper_app import FbScraper
-from scraper.utils.csv import save_csv, upload_data
+from scraper.logger.metrics import start_exporter
+from scraper.logger.queue_handler import stop_queue_logging
+from scraper.utils.csv import save_csv
+from scraper.utils.driver_profiler import DriverProfiler
+from scraper.utils.resource_policy import ResourcePolicy
+from scraper.utils.sink import AsyncQueueSink, JsonlPostSink, iter_posts
+from scraper.utils.upload_ledger import UploadLedger
+from scraper.utils.uploader import BatchUploader
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 max_concurrent_requests = 10
 
 
-async def bound_send_post(sem: asyncio.Semaphore, session: aiohttp.ClientSession, data: dict) -> None:
-    async with sem:
-        await upload_data(session, data)
+class UploadLatency:
+    # time from the post built by the scraper until the server accepted its batch
+    def __init__(self):
+        self.created_at = {}
+        self.samples = []
+
+    def track(self, key, created_at):
+        self.created_at[key] = created_at
+
+    def on_result(self, keys, ok):
+        now = time.time()
+        for key in keys:
+            created_at = self.created_at.pop(key, None)
+            if ok and created_at is not None:
+                self.samples.append(now - created_at)
+                logger.histogram("upload_latency_seconds", now - created_at)
+        logger.counter("uploads_total", len(keys), status="ok" if ok else "failed")
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no posts uploaded"
+        samples = sorted(self.samples)
+        return f"mean {sum(samples) / len(samples):.2f}s, p50 {samples[len(samples) // 2]:.2f}s, " \
+               f"p95 {samples[int(len(samples) * 0.95)]:.2f}s, max {samples[-1]:.2f}s"
+
+
+async def upload_worker(queue: asyncio.Queue, uploader: BatchUploader, ledger: UploadLedger,
+                        latency: UploadLatency) -> None:
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            key, post, created_at = item
+            # posts already delivered with the same content are not sent again
+            if ledger.should_send(key, post):
+                latency.track(key, created_at)
+                await uploader.add(post, key)
+        except Exception as ex:
+            logger.exception(f"Failed to upload post: {ex}")
+        finally:
+            queue.task_done()
+
+
+def install_shutdown_handlers(scraper, sink: JsonlPostSink, grace: float) -> None:
+    # SIGTERM/SIGINT stop scrolling after the current round, if the scraper (FbScraper or Orchestrator)
+    # does not return in grace seconds the state is checkpointed from here and the process exits
+    def force_shutdown():
+        logger.error(f"Scraper did not stop in {grace}s, saving checkpoint and exiting")
+        try:
+            scraper.save_checkpoint()
+            sink.close()
+        finally:
+            # os._exit skips the atexit handlers, queued log records are written now
+            stop_queue_logging()
+            os._exit(1)
+
+    def handler(signum, _):
+        if scraper.stop_event.is_set():
+            return
+        logger.info(f"Received signal {signum}, shutting down...")
+        scraper.request_stop()
+        timer = threading.Timer(grace, force_shutdown)
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
 
 
 async def run_application() -> None:
@@ -30,45 +106,175 @@ async def run_application() -> None:
     parser.add_argument("-t", "--timeout", help="Set up page element timeout", default=30)
     parser.add_argument("-c", "--count", help="Set up count posts", default=10)
     parser.add_argument("-hl", "--headless", help="Use headless", default=True)
+    parser.add_argument("-pw", "--profile-workers", help="Count of browsers visiting profiles", type=int, default=0)
+    parser.add_argument("-r", "--resume", help="Continue from the last checkpoint", action="store_true")
+    parser.add_argument("--max-runtime", help="Run budget in seconds", type=float, default=None)
+    parser.add_argument("--shutdown-grace", help="Seconds to flush state on shutdown", type=float, default=30)
+    parser.add_argument("-b", "--batch-size", help="Posts per upload request, 1 sends a single post object",
+                        type=int, default=1)
+    parser.add_argument("--gzip", help="Compress upload requests with the gzip level", type=int, default=None)
+    parser.add_argument("-q", "--queue-size", help="Posts waiting for upload before scraping is paused",
+                        type=int, default=100)
+    parser.add_argument("--max-held", help="Posts held back until their profile images are found by the profile "
+                                           "workers, beyond that the oldest one is uploaded without them and again "
+                                           "with them later", type=int, default=100)
+    parser.add_argument("-uw", "--upload-workers", help="Count of upload workers", type=int, default=2)
+    parser.add_argument("--requeue-failures", help="Upload again the posts of posts.jsonl that failed before",
+                        action="store_true")
+    parser.add_argument("--targets", help="YAML file of groups and pages to scrape instead of GROUP_NAME, "
+                                          "see conf/targets.yml", default=None)
+    parser.add_argument("--capture-graphql", help="Parse posts from the feed GraphQL responses instead of the DOM",
+                        action="store_true")
+    parser.add_argument("-w", "--workers", help="Count of targets scraped at the same time", type=int, default=2)
+    parser.add_argument("--compact-feed", help="Empty the processed feed posts in the browser, for long runs",
+                        action="store_true")
+    parser.add_argument("--max-browser-rss", help="Recycle the browser once its RSS is over the MB", type=float,
+                        default=None)
+    parser.add_argument("--max-browser-age", help="Recycle the browser after the seconds", type=float, default=None)
+    parser.add_argument("--max-command-latency", help="Recycle the browser once the median WebDriver command "
+                                                      "takes longer than the seconds", type=float, default=None)
+    parser.add_argument("--max-restarts", help="Browsers recycled in a run, also on browser errors", type=int,
+                        default=5)
+    parser.add_argument("--metrics-file", help="Write metrics in the Prometheus text format to the file, "
+                                               "and a JSON summary next to it at the end", default=None)
+    parser.add_argument("--metrics-interval", help="Seconds between two writes of the metrics file", type=float,
+                        default=15)
+    parser.add_argument("--profile-commands", help="Log the time of WebDriver commands by the function sending "
+                                                   "them", action="store_true")
+    parser.add_argument("--profile-folded", help="Write the profiled commands as folded stacks for flamegraph.pl, "
+                                                 "one file per target with --targets", default=None)
+    parser.add_argument("--allow-all-resources", help="Load media, fonts and third party scripts of the pages",
+                        action="store_true")
 
     args = parser.parse_args()
     username = os.getenv('USERNAME')
     password = os.getenv('PASS')
     group_name = os.getenv('GROUP_NAME')
-    sem = asyncio.Semaphore(max_concurrent_requests)
 
     init_logging("scrapper_logs.yml")
+    exporter = start_exporter(args.metrics_file, args.metrics_interval) if args.metrics_file else None
     start_at = time.time()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    # posts are streamed to data/posts.jsonl while scraping, so a crash does not lose the run,
+    # and handed to the upload workers through the bounded queue
+    file_sink = JsonlPostSink()
+    # without profile workers profiles are visited after the crawl, posts are not held until then
+    sink = AsyncQueueSink(queue, loop, file_sink, max_held=args.max_held if args.profile_workers > 0 else 0)
+    checkpoint = Checkpoint()
+    latency = UploadLatency()
+    ledger = UploadLedger()
+
+    def on_result(keys, ok):
+        ledger.on_result(keys, ok)
+        latency.on_result(keys, ok)
+
+    supervisor_options = {
+        "max_rss_mb": args.max_browser_rss,
+        "max_latency": args.max_command_latency,
+        "max_age": args.max_browser_age,
+        "max_restarts": args.max_restarts,
+    }
+
+    if args.targets:
+        # every target is scraped by its own process and browser, posts are merged into the sink
+        s = Orchestrator(load_targets(args.targets), workers=args.workers, queue_size=args.queue_size, options={
+            "headless": args.headless,
+            "username": username,
+            "password": password,
+            "timeout": args.timeout,
+            "profile_workers": args.profile_workers,
+            "resume": args.resume,
+            "capture_graphql": args.capture_graphql,
+            "block_resources": not args.allow_all_resources,
+            "compact_feed": args.compact_feed,
+            "supervisor": supervisor_options,
+            "metrics_file": args.metrics_file,
+            "metrics_interval": args.metrics_interval,
+            "profile_commands": args.profile_commands,
+            "profile_folded": args.profile_folded,
+            "log_conf": "scrapper_logs.yml",
+        })
+        args.resume and s.restore(file_sink)
+        run = functools.partial(s.run, sink)
+    else:
+        s = FbScraper(
+            page_or_group_name=group_name,
+            posts_count=args.count,
+            isGroup=True,
+            proxy=None,
+            headless=args.headless,
+            username=username,
+            password=password,
+            timeout=args.timeout,
+            profile_workers=args.profile_workers,
+            sink=sink,
+            checkpoint=checkpoint,
+            max_runtime=args.max_runtime,
+            capture_graphql=args.capture_graphql,
+            resource_policy=None if args.allow_all_resources else ResourcePolicy(),
+            compact_feed=args.compact_feed,
+            supervisor=DriverSupervisor(**supervisor_options),
+            profiler=DriverProfiler(args.profile_folded) if args.profile_commands or args.profile_folded else None
+        )
 
-    s = FbScraper(
-        page_or_group_name=group_name,
-        posts_count=args.count,
-        isGroup=True,
-        proxy=None,
-        headless=args.headless,
-        username=username,
-        password=password,
-        timeout=args.timeout
-    )
+        state = checkpoint.load() if args.resume else None
+        if state is not None and state["page_or_group_name"] == group_name:
+            s.restore(state)
+        elif args.resume:
+            logger.info("No checkpoint to resume, starting from the top")
+        run = s.scrap_to_json
+    install_shutdown_handlers(s, file_sink, args.shutdown_grace)
+
+    def crawl():
+        # blocking selenium crawl runs in the executor, the event loop keeps uploading meanwhile
+        try:
+            run()
+        finally:
+            sink.close()
 
     try:
-        data = s.scrap_to_json()
+        async with BatchUploader(batch_size=args.batch_size, gzip_level=args.gzip,
+                                 connection_limit=max_concurrent_requests, on_result=on_result) as uploader:
+            workers = [asyncio.create_task(upload_worker(queue, uploader, ledger, latency))
+                       for _ in range(args.upload_workers)]
+            try:
+                await loop.run_in_executor(None, crawl)
+            finally:
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
         logger.info(f"Script running time {time.time() - start_at}")
-        json_data = json.loads(data)
-        logger.info(f"Parsed {len(json_data)} posts, saving phase...")
+        logger.info(f"Uploaded {uploader.sent} posts in {uploader.requests} requests, {uploader.failed} failed, "
+                    f"{ledger.skipped} already uploaded, {sink.released} sent before their profile images "
+                    f"({sink.resent} sent again with them), "
+                    f"latency per post: {latency.summary()}")
+
+        if args.requeue_failures:
+            async with BatchUploader(batch_size=args.batch_size, gzip_level=args.gzip,
+                                     connection_limit=max_concurrent_requests, on_result=ledger.on_result) as uploader:
+                for key, post in ledger.requeue_failures(iter_posts(file_sink.file_path)):
+                    if ledger.should_send(key, post):
+                        await uploader.add(post, key)
+            logger.info(f"Requeued failures: uploaded {uploader.sent}, failed {uploader.failed}")
+
+        if s.is_interrupted():
+            # posts.csv is saved by the resumed run
+            logger.info(f"Stopped after {s.count} posts, continue with --resume")
+            return
+        logger.info(f"Parsed {s.count} posts, saving phase...")
         # save parsed data to csv file
-        save_csv(json_data)
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                asyncio.create_task(bound_send_post(sem, session, json_data[key]))
-                for key in json_data
-            ]
-            await asyncio.gather(*tasks)
+        save_csv(iter_posts(file_sink.file_path, file_sink.start_offset))
         logger.info("Done!")
 
     except Exception as ex:
         logging.error("An error occurred while running the application")
         logging.exception(ex)
+    finally:
+        ledger.close()
+        if exporter is not None:
+            exporter.stop()
+            logger.info(f"Metrics summary is saved to {exporter.summary_path}")
 
 
 if __name__ == "__main__":
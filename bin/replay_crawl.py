@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import time
+
+import path_util  # noqa: F401
+
+from scraper.app.scraper_app import FbScraper
+from scraper.utils.pacing import Pacing
+from scraper.utils.seen_index import SeenPostIndex
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ReplayScraper(FbScraper):
+    # keeps the replay driver to report how much of the trace was served
+    def _init_driver(self):
+        super()._init_driver()
+        self.replayer = self.driver.replayer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scrap_to_json over a recorded WebDriver trace without a browser, "
+                                                 "record one with bench_crawl.py --record. Check the extraction "
+                                                 "against the fixture: replay_crawl.py "
+                                                 "fixtures/replay/group-feed.trace.gz -p 20 "
+                                                 "--base-url http://127.0.0.1:8765 "
+                                                 "-e fixtures/replay/group-feed.expected.json")
+    parser.add_argument("trace", help="Trace recorded by Init(record_trace=...)")
+    parser.add_argument("-g", "--group", help="Group name of the recorded run", default="bench")
+    parser.add_argument("-p", "--posts", help="Count of posts of the recorded run", type=int, default=100)
+    parser.add_argument("--base-url", help="Base url of the recorded run", default="https://facebook.com")
+    parser.add_argument("-e", "--expect", help="JSON of the posts expected from the trace, fails on a difference")
+    parser.add_argument("--save-expected", help="Write the extracted posts as the expected JSON", action="store_true")
+    args = parser.parse_args()
+
+    scraper = ReplayScraper(page_or_group_name=args.group, posts_count=args.posts, isGroup=True,
+                            base_url=args.base_url, replay_trace=args.trace, profile_pacing=Pacing(0),
+                            profile_cache_ttl=0, scroll_pacing=Pacing(0))
+    scraper.seen_index = SeenPostIndex(":memory:")
+
+    started_at = time.perf_counter()
+    posts = json.loads(scraper.scrap_to_json())
+    elapsed = time.perf_counter() - started_at
+    replayer = scraper.replayer
+    logger.info(f"Replayed {len(posts)} posts in {elapsed * 1000:.1f}ms, {replayer.served} commands served, "
+                f"{replayer.repeated} repeated, {replayer.skipped} skipped, {replayer.remaining} not reached")
+
+    if args.expect and args.save_expected:
+        with open(args.expect, "w", encoding="utf-8") as fd:
+            json.dump(posts, fd, ensure_ascii=False, indent=2, sort_keys=True)
+    elif args.expect:
+        with open(args.expect, "r", encoding="utf-8") as fd:
+            expected = json.load(fd)
+        missing = expected.keys() - posts.keys()
+        changed = [key for key in expected.keys() & posts.keys() if expected[key] != posts[key]]
+        added = posts.keys() - expected.keys()
+        if missing or changed or added:
+            logger.error(f"Extraction differs from {args.expect}: missing {sorted(missing)}, "
+                         f"changed {sorted(changed)}, added {sorted(added)}")
+            raise SystemExit(1)
+        logger.info(f"Extraction matches {args.expect}")
+
+
+if __name__ == "__main__":
+    main()
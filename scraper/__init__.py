@@ -84,6 +84,7 @@ def init_logging(conf_filename: str):
 
     from ruamel.yaml import YAML
 
+    from scraper.logger.queue_handler import start_queue_logging, stop_queue_logging
     from scraper.logger.struct_logger import StructLogger, StructLogRecord
     global STRUCT_LOGGER_SET
     if not STRUCT_LOGGER_SET:
@@ -102,4 +103,9 @@ def init_logging(conf_filename: str):
         # yml_source = yml_source.replace("$DATETIME", pd.Timestamp.now().strftime("%Y-%m-%d-%H-%M-%S"))
         io_stream: io.StringIO = io.StringIO(yml_source)
         config_dict: Dict = yaml_parser.load(io_stream)
+        # `queue: true` hands the records to a listener thread writing to the configured handlers
+        use_queue = config_dict.pop("queue", False)
+        # handlers of the previous config are closed by dictConfig, the listener has to be done with them
+        stop_queue_logging()
         logging.config.dictConfig(config_dict)
+        use_queue and start_queue_logging()
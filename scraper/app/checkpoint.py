@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import time
+from os.path import exists, join
+from typing import Optional
+
+from scraper import data_path
+
+s_logger = None
+
+
+class Checkpoint:
+    """
+    Scraper state saved periodically to data/checkpoint.json, so an interrupted run can be resumed
+    """
+
+    def __init__(self, file_path: str = None, interval: float = 30.0):
+        self.file_path = file_path or join(data_path(), "checkpoint.json")
+        self.interval = interval
+        self.saved_at = 0.0
+
+    @classmethod
+    def logger(cls):
+        global s_logger
+        if s_logger is None:
+            s_logger = logging.getLogger(__name__)
+        return s_logger
+
+    def is_due(self) -> bool:
+        return time.time() - self.saved_at >= self.interval
+
+    def save(self, state: dict):
+        tmp_path = f"{self.file_path}.tmp"
+        try:
+            with open(tmp_path, mode='w', encoding='utf-8') as fd:
+                json.dump(state, fd, ensure_ascii=False)
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(tmp_path, self.file_path)
+            self.saved_at = time.time()
+        except Exception as ex:
+            self.logger().error(f"Error at save checkpoint {self.file_path}: {ex}")
+
+    def load(self) -> Optional[dict]:
+        if not exists(self.file_path):
+            return None
+        try:
+            with open(self.file_path, mode='r', encoding='utf-8') as fd:
+                return json.load(fd)
+        except Exception as ex:
+            self.logger().error(f"Error at load checkpoint {self.file_path}: {ex}")
+            return None
+
+    def clear(self):
+        if exists(self.file_path):
+            os.remove(self.file_path)
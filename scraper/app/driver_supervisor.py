@@ -0,0 +1,108 @@
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Optional
+
+import psutil
+from selenium.webdriver.remote.command import Command
+
+from scraper.utils import driver_hooks
+
+s_logger = None
+
+
+def browser_rss(driver) -> int:
+    # RSS of geckodriver and every browser process started by it, 0 if the driver has no local process
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        return sum(process.memory_info().rss for process in [root, *root.children(recursive=True)])
+    except (psutil.Error, AttributeError):
+        return 0
+
+
+class CommandLatency(driver_hooks.CommandExecutorProxy):
+    # duration of the last `window` commands, commands waiting for the page (navigation, async scripts) are not
+    # counted as their duration depends on the page and not on the browser
+    IGNORED = (Command.NEW_SESSION, Command.QUIT, Command.GET, Command.EXECUTE_ASYNC_SCRIPT)
+
+    def __init__(self, executor, window: int = 50):
+        super().__init__(executor)
+        self.durations = deque(maxlen=window)
+
+    def execute(self, command, params):
+        started_at = time.perf_counter()
+        try:
+            return super().execute(command, params)
+        finally:
+            command not in self.IGNORED and self.durations.append(time.perf_counter() - started_at)
+
+    def median(self) -> Optional[float]:
+        # None until half of the window is filled
+        if len(self.durations) < self.durations.maxlen // 2:
+            return None
+        return statistics.median(self.durations)
+
+
+class DriverSupervisor:
+    """
+    Watches the feed driver and tells when the browser has to be recycled: the RSS of the browser processes
+    is over max_rss_mb, the median command latency is over max_latency seconds or the browser is older than
+    max_age seconds. FbScraper replaces the browser, restores the saved session and scrolls back to the feed
+    cursor, the same browser is also replaced when a WebDriver command fails. At most max_restarts browsers
+    are replaced in a run
+    """
+
+    def __init__(self, max_rss_mb: float = None, max_latency: float = None, max_age: float = None,
+                 max_restarts: int = 5, latency_window: int = 50):
+        self.max_rss_mb = max_rss_mb
+        self.max_latency = max_latency
+        self.max_age = max_age
+        self.max_restarts = max_restarts
+        self.latency_window = latency_window
+        self.restarts = 0
+        self.peak_rss = 0
+        self.driver = None
+        self.latency = None
+        self.started_at = None
+
+    @classmethod
+    def logger(cls):
+        global s_logger
+        if s_logger is None:
+            s_logger = logging.getLogger(__name__)
+        return s_logger
+
+    def attach(self, driver):
+        # called for every new browser of the feed
+        self.driver = driver
+        self.latency = driver_hooks.install(driver, CommandLatency, self.latency_window)
+        self.started_at = time.time()
+
+    def can_restart(self) -> bool:
+        return self.restarts < self.max_restarts
+
+    def on_restart(self):
+        self.restarts += 1
+
+    def recycle_reason(self) -> Optional[str]:
+        # returns why the browser has to be replaced, None if it is healthy or no restart is left
+        if self.driver is None:
+            return None
+        reason = None
+        rss = browser_rss(self.driver)
+        self.peak_rss = max(self.peak_rss, rss)
+        latency = self.latency.median()
+        if self.max_rss_mb is not None and rss > self.max_rss_mb * 1024 * 1024:
+            reason = f"browser RSS {rss / 1024 / 1024:.0f} MB is over {self.max_rss_mb:.0f} MB"
+        elif self.max_latency is not None and latency is not None and latency > self.max_latency:
+            reason = f"median command latency {latency * 1000:.0f}ms is over {self.max_latency * 1000:.0f}ms"
+        elif self.max_age is not None and time.time() - self.started_at > self.max_age:
+            reason = f"browser is older than {self.max_age:.0f}s"
+
+        if reason is not None and not self.can_restart():
+            self.logger().info(f"Browser is not recycled, {self.restarts} restarts were done already: {reason}")
+            # the limit is logged once, the browser is kept until the end of the run
+            self.driver = None
+            return None
+        return reason
@@ -0,0 +1,271 @@
+import dataclasses
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+from os.path import join
+from typing import List, Optional
+
+from scraper import data_path, init_logging
+from scraper.app.checkpoint import Checkpoint
+from scraper.logger.metrics import start_exporter
+from scraper.logger.queue_handler import stop_queue_logging
+
+s_logger = None
+
+
+@dataclasses.dataclass
+class Target:
+    name: str
+    posts_count: int = 10
+    isGroup: bool = True
+    # seconds the target may take, including the runs it was resumed from
+    max_runtime: Optional[float] = None
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^\w.-]+", "_", self.name)
+
+
+def load_targets(file_path: str) -> List[Target]:
+    # YAML file with a `targets` list, see conf/targets.yml
+    from ruamel.yaml import YAML
+
+    with open(file_path, mode='r', encoding='utf-8') as fd:
+        config = YAML(typ='safe').load(fd) or {}
+    return [Target(**item) for item in config.get("targets") or []]
+
+
+class QueueSink:
+    """
+    Sink of a target process, posts and updates are sent to the orchestrator that writes the merged stream.
+    put blocks while the queue is full, so a slow consumer pushes back on every target. flush returns once
+    the orchestrator has written and flushed everything queued before, it sets the flushed event
+    """
+
+    def __init__(self, queue, flushed, name: str):
+        self.queue = queue
+        self.flushed = flushed
+        self.name = name
+        self.start_offset = None
+
+    def write_post(self, key: str, post: dict):
+        self.queue.put(("post", key, post))
+
+    def write_update(self, key: str, fields: dict):
+        self.queue.put(("update", key, fields))
+
+    def flush(self, fsync: bool = True):
+        self.flushed.clear()
+        self.queue.put(("flush", self.name, fsync))
+        self.flushed.wait()
+
+    def close(self):
+        pass
+
+
+def _ignore_sigint():
+    # the terminal sends SIGINT to the whole process group, the orchestrator decides when targets stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _watch_stop(stop_event, finished: threading.Event, scraper):
+    # forwards the stop of the orchestrator to the scraper of this process
+    try:
+        while not finished.is_set():
+            if stop_event.wait(1.0):
+                scraper.request_stop()
+                return
+    except Exception:
+        # the orchestrator is gone
+        scraper.request_stop()
+
+
+def run_target(target: Target, options: dict, queue, stop_event, flushed) -> dict:
+    # entry point of a pool process, scrapes one target with its own browser, session directory, checkpoint,
+    # seen index and profile image cache
+    from scraper.app.driver_supervisor import DriverSupervisor
+    from scraper.app.scraper_app import FbScraper
+    from scraper.utils.driver_profiler import DriverProfiler
+    from scraper.utils.resource_policy import ResourcePolicy
+
+    options.get("log_conf") and init_logging(options["log_conf"])
+    # every process exports its own file, series are labelled with the target
+    exporter = None
+    if options.get("metrics_file"):
+        base, ext = os.path.splitext(options["metrics_file"])
+        exporter = start_exporter(f"{base}-{target.slug}{ext}", options.get("metrics_interval", 15),
+                                  target=target.name)
+    checkpoint = Checkpoint(join(data_path(), f"checkpoint-{target.slug}.json"))
+    # the report is logged by every process, folded stacks are written per target like the metrics
+    profiler = None
+    if options.get("profile_commands") or options.get("profile_folded"):
+        base, ext = os.path.splitext(options.get("profile_folded") or "")
+        profiler = DriverProfiler(f"{base}-{target.slug}{ext}" if base else None)
+    scraper = FbScraper(
+        page_or_group_name=target.name,
+        posts_count=target.posts_count,
+        isGroup=target.isGroup,
+        headless=options.get("headless", True),
+        username=options.get("username"),
+        password=options.get("password"),
+        timeout=options.get("timeout", 30),
+        profile_workers=options.get("profile_workers", 0),
+        sink=QueueSink(queue, flushed, target.name),
+        checkpoint=checkpoint,
+        max_runtime=target.max_runtime,
+        session_dir=join(data_path(), "session", "targets", target.slug),
+        seen_index_path=join(data_path(), f"seen_posts-{target.slug}.sqlite"),
+        profile_cache_path=join(data_path(), f"profile_images-{target.slug}.json"),
+        capture_graphql=options.get("capture_graphql", False),
+        resource_policy=ResourcePolicy() if options.get("block_resources") else None,
+        compact_feed=options.get("compact_feed", False),
+        supervisor=DriverSupervisor(**options["supervisor"]) if options.get("supervisor") else None,
+        profiler=profiler,
+    )
+    state = checkpoint.load() if options.get("resume") else None
+    if state is not None and state["page_or_group_name"] == target.name:
+        scraper.restore(state)
+
+    finished = threading.Event()
+    threading.Thread(target=_watch_stop, args=(stop_event, finished, scraper), daemon=True).start()
+
+    started_at = time.time()
+    try:
+        scraper.scrap_to_json()
+    finally:
+        finished.set()
+        exporter is not None and exporter.stop()
+        # pool processes exit without atexit handlers, queued records are written now
+        stop_queue_logging()
+    return {
+        "target": target.name,
+        "posts": scraper.count,
+        "seconds": time.time() - started_at,
+        "stopped": scraper.is_interrupted(),
+    }
+
+
+class Orchestrator:
+    """
+    Scrapes many targets over a pool of at most `workers` processes, every target runs FbScraper with an
+    isolated browser and its own posts_count and max_runtime budget. Posts of all targets are merged into
+    one stream passed to the sink of run, e.g. AsyncQueueSink feeding the uploader
+    """
+
+    def __init__(self, targets: List[Target], workers: int = 2, options: dict = None, queue_size: int = 1000,
+                 checkpoint: Checkpoint = None):
+        self.targets = targets
+        self.workers = workers
+        self.options = options or {}
+        self.queue_size = queue_size
+        self.checkpoint = checkpoint or Checkpoint(join(data_path(), "checkpoint-targets.json"))
+        self.results = []
+        self.count = 0
+        self.stop_event = threading.Event()
+        self._remote_stop = None
+        # target name -> event set once the posts queued by the target are flushed to the sink
+        self._flushed = {}
+        self._sink = None
+
+    @classmethod
+    def logger(cls):
+        global s_logger
+        if s_logger is None:
+            s_logger = logging.getLogger(__name__)
+        return s_logger
+
+    def request_stop(self):
+        # targets stop after their current round and checkpoint, targets not started yet are cancelled
+        self.stop_event.set()
+        self._remote_stop is not None and self._remote_stop.set()
+
+    def save_checkpoint(self):
+        # targets checkpoint themselves, the orchestrator keeps where this run starts in the merged stream
+        if self._sink is not None and self._sink.start_offset is not None:
+            self.checkpoint.save({"sink_offset": self._sink.start_offset})
+
+    def restore(self, sink):
+        state = self.checkpoint.load()
+        if state is not None and state.get("sink_offset") is not None:
+            sink.start_offset = state["sink_offset"]
+
+    def _forward(self, item):
+        kind, key, value = item
+        if kind == "post":
+            self.count += 1
+            self._sink.write_post(key, value)
+        elif kind == "flush":
+            # the target commits its seen ids once the posts are durable
+            self._sink.flush(value)
+            self._flushed[key].set()
+        else:
+            self._sink.write_update(key, value)
+
+    def _drain(self, posts_queue, timeout: float = None):
+        try:
+            while True:
+                self._forward(posts_queue.get(timeout=timeout) if timeout else posts_queue.get_nowait())
+                timeout = None
+        except queue.Empty:
+            pass
+
+    def run(self, sink):
+        # blocks until all targets are done, posts are written to the sink from the calling thread
+        self._sink = sink
+        context = multiprocessing.get_context("spawn")
+        manager = SyncManager(ctx=context)
+        manager.start(_ignore_sigint)
+        try:
+            posts_queue = manager.Queue(self.queue_size)
+            self._remote_stop = manager.Event()
+            self.stop_event.is_set() and self._remote_stop.set()
+            self._flushed = {target.name: manager.Event() for target in self.targets}
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_ignore_sigint) as pool:
+                futures = {pool.submit(run_target, target, self.options, posts_queue, self._remote_stop,
+                                       self._flushed[target.name]): target
+                           for target in self.targets}
+                pending = set(futures)
+                while pending:
+                    self._drain(posts_queue, timeout=0.5)
+                    if self.stop_event.is_set():
+                        for future in pending:
+                            future.cancel()
+                    for future in [future for future in pending if future.done()]:
+                        pending.discard(future)
+                        self._collect(futures[future], future)
+                # every put of a target happens before its future is done
+                self._drain(posts_queue)
+        finally:
+            self._remote_stop = None
+            self._flushed = {}
+            manager.shutdown()
+
+        if self.is_interrupted():
+            self.save_checkpoint()
+        else:
+            self.checkpoint.clear()
+        return self.results
+
+    def is_interrupted(self) -> bool:
+        # stopped, or a target is stopped or out of its budget and has to be resumed
+        return self.stop_event.is_set() or any(result["stopped"] for result in self.results)
+
+    def _collect(self, target: Target, future):
+        if future.cancelled():
+            self.logger().info(f"Target {target.name} was not started")
+            return
+        try:
+            result = future.result()
+        except Exception as ex:
+            self.logger().exception(f"Target {target.name} failed: {ex}")
+            return
+        self.results.append(result)
+        self.logger().info(f"Target {target.name} is done: {result['posts']} posts in {result['seconds']:.0f}s"
+                           f"{', stopped' if result['stopped'] else ''}")
@@ -0,0 +1,105 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import scraper.utils.selenium_utils as sutils
+from scraper.utils.pacing import Pacing
+
+s_logger = None
+
+
+def visit_profile(driver, name, profile_url, timeout) -> Optional[List[str]]:
+    # opens the profile and returns its avatar image urls
+    driver.get(profile_url)
+    sutils.wait_for_profile_image(driver, name, timeout)
+    return sutils.find_profile_image(driver, name)
+
+
+class ProfileEnricher:
+    """
+    Visits profile pages over a pool of browsers, every worker thread owns one driver created by driver_factory.
+    Profiles can be submitted while the feed is still being scrolled, results are collected by key
+    """
+
+    def __init__(self, driver_factory: Callable, workers: int = 1, timeout: int = 30, pacing: Pacing = None,
+                 on_result: Callable[[str, List[str]], None] = None):
+        self.driver_factory = driver_factory
+        self.workers = workers
+        self.timeout = timeout
+        self.pacing = pacing or Pacing()
+        self.on_result = on_result
+        self.results: Dict[str, List[str]] = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def logger(cls):
+        global s_logger
+        if s_logger is None:
+            s_logger = logging.getLogger(__name__)
+        return s_logger
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run_worker, name=f"profile-enricher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key: str, name: str, profile_url: str):
+        self.start()
+        self._queue.put((key, name, profile_url))
+
+    def cancel(self):
+        # drops the profiles that are not visited yet
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def join(self) -> Dict[str, List[str]]:
+        # waits until all submitted profiles are visited and stops the workers
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return self.results
+
+    def _set_result(self, key, images):
+        with self._lock:
+            self.results[key] = images
+        if self.on_result is not None:
+            self.on_result(key, images)
+
+    def _run_worker(self):
+        driver = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                key, name, profile_url = item
+                started_at = time.time()
+                try:
+                    if driver is None:
+                        driver = self.driver_factory()
+                    images = visit_profile(driver, name, profile_url, self.timeout)
+                    if not images:
+                        self.logger().info(f"Not found profile image name: {name} url: {profile_url}")
+                    self._set_result(key, images or [])
+                    self.logger().debug(f"Visited profile {profile_url} in {time.time() - started_at:.2f}s")
+                    self.logger().counter("profile_visits_total", status="ok" if images else "not_found")
+                    self.logger().histogram("profile_visit_seconds", time.time() - started_at)
+                except Exception as ex:
+                    self.logger().info(f"Failed to parse user profile: {profile_url}, error: {ex}")
+                    self.logger().counter("profile_visits_total", status="failed")
+                self.pacing.wait()
+        finally:
+            if driver is not None:
+                sutils.close_driver(driver)
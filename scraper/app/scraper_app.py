@@ -1,30 +1,49 @@
 import json
 import logging
 import os
-import platform
+import queue
+import threading
 import time
 from os.path import join
 
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from seleniumwire import webdriver
-from webdriver_manager.firefox import GeckoDriverManager
 
-import scraper.utils.csv as csvutils
 import scraper.utils.selenium_utils as sutils
 from scraper import data_path
+from scraper.app.checkpoint import Checkpoint
+from scraper.app.driver_supervisor import DriverSupervisor
+from scraper.app.profile_enricher import ProfileEnricher, visit_profile
+from scraper.app.session import SessionManager
+from scraper.logger.metrics import COUNT_BUCKETS, REGISTRY
+from scraper.utils import driver_hooks, driver_trace
+from scraper.utils.driver_profiler import DriverProfiler
+from scraper.utils.geckodriver import resolve_geckodriver
+from scraper.utils.graphql_capture import GraphQLCapture
+from scraper.utils.pacing import Pacing
+from scraper.utils.profile_cache import ProfileImageCache
+from scraper.utils.resource_policy import ResourcePolicy
+from scraper.utils.seen_index import SeenPostIndex
 
 s_logger = None
 
 
-def is_macos_platform():
-    return platform.system() == 'Darwin'
-
-
 class Init:
-    def __init__(self, proxy=None, headless=True):
+    def __init__(self, proxy=None, headless=True, profile_dir=None, record_trace=None, replay_trace=None,
+                 resource_policy: ResourcePolicy = None):
         self.proxy = proxy
         self.headless = headless
+        self.profile_dir = profile_dir
+        # commands of the driver are recorded to record_trace, replay_trace returns a driver without a browser
+        # serving the commands of a recorded trace, see scraper.utils.driver_trace
+        self.record_trace = record_trace
+        self.replay_trace = replay_trace
+        # browser prefs and request interceptors blocking the resources extraction does not need
+        self.resource_policy = resource_policy
+        # seconds spent in every startup phase of the last init
+        self.timings = {}
 
     @classmethod
     def logger(cls):
@@ -42,37 +61,74 @@ class Init:
         browser_option.add_argument('--disable-gpu')
         browser_option.add_argument('--log-level=3')
         browser_option.add_argument('--disable-notifications')
+        if self.profile_dir is not None:
+            # persistent profile keeps the browser state of the saved session
+            browser_option.add_argument('-profile')
+            browser_option.add_argument(self.profile_dir)
+        if self.resource_policy is not None:
+            for name, value in self.resource_policy.prefs().items():
+                browser_option.set_preference(name, value)
         # browser_option.add_argument('--disable-popup-blocking')
         return browser_option
 
     def init(self) -> webdriver.Firefox:
+        if self.replay_trace is not None:
+            self.logger().info(f"Replaying browser session from {self.replay_trace}")
+            return driver_trace.ReplayDriver(self.replay_trace)
+
+        started_at = time.time()
+        # geckodriver is resolved once and pinned, so next starts do not hit webdriver-manager
+        executable_path = resolve_geckodriver()
+        self.timings["driver_resolve"] = time.time() - started_at
+
+        started_at = time.time()
+        driver = self._launch(executable_path)
+        self.timings["browser_launch"] = time.time() - started_at
+        self.resource_policy is not None and self.resource_policy.install(driver)
+        self.record_trace is not None and driver_trace.record(driver, self.record_trace)
+        return driver
+
+    def _launch(self, executable_path) -> webdriver.Firefox:
         browser_option = FirefoxOptions()
-        # automatically installs chromedriver and initialize it and returns the instance
-        firefox_service = FirefoxService(executable_path=GeckoDriverManager().install(), log_path='geckodriver.log')
+        firefox_service = FirefoxService(executable_path=executable_path, log_path='geckodriver.log')
+        options = {}
+
+        if self.resource_policy is not None:
+            # every request passes the interceptors, only the latest ones are kept by selenium-wire
+            options.update({'request_storage': 'memory', 'request_storage_max_size': 200})
 
         if self.proxy is not None:
-            options = {
+            options.update({
                 'https': 'https://{}'.format(self.proxy.replace(" ", "")),
                 'http': 'http://{}'.format(self.proxy.replace(" ", "")),
                 'no_proxy': 'localhost, 127.0.0.1'
-            }
+            })
             self.logger().info("Using: {}".format(self.proxy))
-            return webdriver.Firefox(executable_path=GeckoDriverManager().install(),
-                                     options=self.set_properties(browser_option), seleniumwire_options=options)
 
-        if is_macos_platform():
+        if options:
             return webdriver.Firefox(service=firefox_service, options=self.set_properties(browser_option),
-                                     log_path='geckodriver.log')
-        else:
-            return webdriver.Firefox(options=self.set_properties(browser_option), log_path='geckodriver.log')
+                                     seleniumwire_options=options)
+        return webdriver.Firefox(service=firefox_service, options=self.set_properties(browser_option))
 
 
 class FbScraper:
     def __init__(self, page_or_group_name, posts_count=10, proxy=None,
-                 timeout=600, headless=True, isGroup=False, username=None, password=None):
+                 timeout=600, headless=True, isGroup=False, username=None, password=None, batch_extract=True,
+                 save_snapshots=False, profile_workers=0, profile_pacing=None,
+                 profile_cache_ttl=7 * 24 * 3600, reuse_session=True, scroll_pacing=None, scroll_timeout=10,
+                 scroll_batch=1, sink=None, checkpoint: Checkpoint = None, max_runtime=None,
+                 base_url="https://facebook.com", record_trace=None, replay_trace=None, session_dir=None,
+                 capture_graphql=False, graphql_record_dir=None, resource_policy: ResourcePolicy = None,
+                 compact_feed=False, compact_margin=5, supervisor: DriverSupervisor = None,
+                 profiler: DriverProfiler = None, seen_index_path=None, profile_cache_path=None):
         self.page_or_group_name = page_or_group_name
         self.posts_count = posts_count
-        self.URL = f"https://facebook.com/groups/{self.page_or_group_name}"
+        # base_url is replaced by the address of FakeFeedServer in the benchmarks
+        self.URL = f"{base_url}/groups/{self.page_or_group_name}" if isGroup else \
+            f"{base_url}/{self.page_or_group_name}"
+        # trace of the feed driver, profile drivers of the enrichment pool are neither recorded nor replayed
+        self.record_trace = record_trace
+        self.replay_trace = replay_trace
         self.driver: webdriver.Firefox
         self.proxy = proxy
         self.timeout = timeout
@@ -80,14 +136,72 @@ class FbScraper:
         self.isGroup = isGroup
         self.username = username
         self.password = password
+        self.batch_extract = batch_extract
+        self.save_snapshots = save_snapshots
+        # profile_workers=0 visits profiles with the feed driver after scrolling,
+        # otherwise profiles are visited by a pool of extra browsers while the feed is scrolled
+        self.profile_workers = profile_workers
+        self.profile_pacing = profile_pacing or Pacing(3.0)
+        self.enricher = None
+        # (profile url, images) visited by the enricher workers, applied by the scraper thread every round
+        self.profile_results = queue.Queue()
+        # profile_cache_ttl=0 disables the on-disk cache, authors are still visited once per run,
+        # scrapers running at the same time use their own file, the last save would win otherwise
+        self.profile_cache = ProfileImageCache(profile_cache_path, ttl=profile_cache_ttl) \
+            if profile_cache_ttl > 0 else None
+        # profile url -> name and keys of the posts waiting for the profile images, in-flight visits
+        self.pending_profiles = {}
+        # profile url -> images of the profiles visited in this run, found or not, checked before the cache
+        self.visited_profiles = {}
+        # saved cookies and browser profile of the account, so login is only done when the session expired
+        # session_dir isolates the browser profile of scrapers running at the same time, see orchestrator
+        self.session = SessionManager(username, session_dir) if reuse_session and username is not None else None
+        # jitter between two scrolls, scroll itself returns once scroll_batch new posts are loaded
+        self.scroll_pacing = scroll_pacing or Pacing(1.0, 3.0)
+        self.scroll_timeout = scroll_timeout
+        self.scroll_batch = scroll_batch
+        # posts are parsed from the captured feed GraphQL responses, DOM extraction picks up the posts
+        # without a response, e.g. the first page rendered into the html
+        self.capture_graphql = capture_graphql
+        self.graphql_record_dir = graphql_record_dir
+        self.graphql = None
+        # shared by the feed and the profile drivers, bytes are counted over all of them
+        self.resource_policy = resource_policy
+        self.scrolls = 0
+        self.scroll_seconds = 0.0
+        self.startup_latency = None
+        self.startup_timings = {}
+        # index of the first feed child that was not extracted yet
+        self.feed_cursor = 0
+        # processed feed children are emptied to keep browser memory flat on deep scrolls, the last
+        # compact_margin of them are kept as the page may still render into them. Only group feeds are
+        # compacted, page posts are not the direct children the cursor counts
+        self.compact_feed = compact_feed and isGroup
+        self.compact_margin = compact_margin
+        # index of the first feed child that was not compacted yet
+        self.compacted = 0
+        # replaces the feed browser on memory, latency or age limits and on failed commands
+        self.supervisor = supervisor
+        # commands of the feed driver since the last round, only counted when metrics are enabled
+        self.commands = None
+        # times the commands of the feed and profile drivers by the function sending them,
+        # the report is logged at the end of scrap_to_json
+        self.profiler = profiler
+        # accepted posts are streamed to the sink, e.g. JsonlPostSink, instead of being kept in data_dct
+        self.sink = sink
         self.count = 0
         self.data_dct = {}
+        # posts visited in this run, accepted posts of all runs are kept in the seen index,
+        # its write transaction is open for a whole round so scrapers running at the same time need their own file
         self.visited_posts = set()
-        root_path = data_path()
-        file_path = join(root_path, "posts.csv")
-
-        if os.path.exists(file_path):
-            self.visited_posts = csvutils.parse_csv(file_path)
+        self.seen_index = SeenPostIndex(seen_index_path)
+        self.seen_index.import_csv(join(data_path(), "posts.csv"))
+        self.checkpoint = checkpoint
+        # seconds the run may take in total, including the runs it was resumed from
+        self.max_runtime = max_runtime
+        self.elapsed_before = 0.0
+        self.run_started_at = None
+        self.stop_event = threading.Event()
 
     @classmethod
     def logger(cls):
@@ -98,31 +212,385 @@ class FbScraper:
 
     def _init_driver(self):
         self.logger().info("Init selenium driver...")
-        self.driver = Init(self.proxy, self.headless).init()
+        profile_dir = self.session.profile_dir if self.session is not None else None
+        init = Init(self.proxy, self.headless, profile_dir=profile_dir, record_trace=self.record_trace,
+                    replay_trace=self.replay_trace, resource_policy=self.resource_policy)
+        self.driver = init.init()
+        self.startup_timings = dict(init.timings)
+        self.compacted = 0
+        self.supervisor is not None and self.supervisor.attach(self.driver)
+        self.commands = driver_hooks.install(self.driver, driver_hooks.CommandCounter) if REGISTRY.enabled else None
+        self.profiler is not None and self.profiler.attach(self.driver)
+
+    def _open_session(self, driver, timings=None):
+        started_at = time.time()
+        driver.get(self.URL)
+        if timings is not None:
+            timings["first_page_load"] = time.time() - started_at
+
+        if self.session is not None and self.session.restore(driver, self.URL):
+            self.logger().info("Restored saved session")
+            return True
+
+        sutils.accept_cookies(driver)
+        # pass login and pass
+        self.username is not None and sutils.login(driver, self.username, self.password)
 
-    def _handle_popup(self):
+        # sometimes we get popup that says "your request couldn't be processed", however
+        # posts are loading in background if popup is closed, so call this method in case if it pops up.
+        sutils.close_error_popup(driver)
+
+        if self.session is not None and sutils.wait_for_login(driver, self.timeout):
+            self.session.save(driver)
+        return False
+
+    def _new_profile_driver(self):
+        # driver of the enrichment pool, logged in the same way as the feed driver
+        self.logger().info("Init selenium driver for profiles...")
+        driver = Init(self.proxy, self.headless, resource_policy=self.resource_policy).init()
+        self.profiler is not None and self.profiler.attach(driver)
+        self._open_session(driver)
+        self._handle_popup(driver)
+        return driver
+
+    def _handle_popup(self, driver=None):
+        driver = driver or self.driver
         try:
-            sutils.close_modern_layout_signup_modal(self.driver)
-            sutils.close_cookie_consent_modern_layout(self.driver)
+            sutils.close_modern_layout_signup_modal(driver)
+            sutils.close_cookie_consent_modern_layout(driver)
         except Exception as ex:
             self.logger().exception("Error at handle_popup : {}".format(ex))
 
-    def reach_timeout(self, start_time, current_time) -> bool:
-        return (current_time - start_time) > self.timeout
+    def _accept_post(self, key, name, profile_url, content, post_url, group_images, create_at):
+        post = sutils.build_post(name, profile_url, content, post_url, group_images, create_at)
+        if post is None:
+            return
+        images = self._request_profile(key, name, profile_url)
+        if images is not None:
+            post['profile_images'] = images
+        self._store_post(key, post)
+
+    def _store_post(self, key, post):
+        # with a sink the post is written right away and only the pending profiles are kept in memory
+        self.count += 1
+        self.seen_index.add(key)
+        if self.sink is not None:
+            self.sink.write_post(key, post)
+        else:
+            self.data_dct[key] = post
 
-    def parse_page(self, url: str, name: str):
+    def _store_profile_images(self, key, images):
+        if self.sink is not None:
+            self.sink.write_update(key, {"profile_images": images})
+        else:
+            self.data_dct[key]['profile_images'] = images
+
+    def _request_profile(self, key, name, profile_url):
+        # returns cached profile images or queues the profile visit, the same author is visited once per run
+        if profile_url in self.pending_profiles:
+            self.pending_profiles[profile_url]["keys"].append(key)
+            return None
+        if profile_url in self.visited_profiles:
+            return self.visited_profiles[profile_url]
+
+        images = self.profile_cache.get(profile_url) if self.profile_cache is not None else None
+        if images is not None:
+            return images
+
+        self.pending_profiles[profile_url] = {"name": name, "keys": [key]}
+        self.enricher is not None and self.enricher.submit(profile_url, name, profile_url)
+        return None
+
+    def _set_profile_images(self, profile_url, images):
+        self.visited_profiles[profile_url] = images or []
+        self.profile_cache is not None and self.profile_cache.set(profile_url, images)
+        for key in self.pending_profiles.pop(profile_url, {}).get("keys", []):
+            self._store_profile_images(key, images)
+
+    def _apply_profile_results(self):
+        # the held posts of the sink are released as soon as their profile is visited, not after the crawl
+        while True:
+            try:
+                profile_url, images = self.profile_results.get_nowait()
+            except queue.Empty:
+                return
+            self._set_profile_images(profile_url, images)
+
+    def _extract_post(self, post):
+        # per-element extraction, costs several WebDriver round trips for every field of the post
+        try:
+            key, post_url, link_element = sutils.find_post_status(post, self.isGroup)
+
+            if post_url is None or key in self.visited_posts or key in self.seen_index:
+                return
+
+            self.visited_posts.add(key)
+
+            post_url = post_url.split('?')[0]
+            name, profile_url = sutils.find_post_name(post)
+            content = sutils.find_post_content(post, self.driver)
+            group_images = sutils.find_post_image_url(post)
+            create_at = sutils.find_post_time(
+                post, link_element, self.driver, self.isGroup)
+
+            self._accept_post(key, name, profile_url, content, post_url, group_images, create_at)
+        except Exception as ex:
+            self.logger().exception(f"Failed to process the post, error: {ex}")
+
+    def _extract_record(self, record):
+        try:
+            key, post_url = sutils.find_record_status(record, self.isGroup)
+
+            if post_url is None or key in self.visited_posts or key in self.seen_index:
+                return
+
+            self.visited_posts.add(key)
+
+            post_url = post_url.split('?')[0]
+            name, profile_url, content, group_images, create_at = sutils.find_record_fields(record, self.isGroup)
+
+            self._accept_post(key, name, profile_url, content, post_url, group_images, create_at)
+        except Exception as ex:
+            self.logger().exception(f"Failed to process the post record, error: {ex}")
+
+    def _extract_graphql(self) -> int:
+        accepted = 0
+        for key, post in self.graphql.collect():
+            if key in self.visited_posts or key in self.seen_index:
+                continue
+            self.visited_posts.add(key)
+            accepted += 1
+            if "profile_images" in post:
+                self.profile_cache is not None and self.profile_cache.set(post['profile_url'], post['profile_images'])
+            else:
+                images = self._request_profile(key, post['name'], post['profile_url'])
+                if images is not None:
+                    post['profile_images'] = images
+            self._store_post(key, post)
+        return accepted
+
+    def _extract_posts(self):
+        # only the feed children after the cursor are extracted, all of them with a single execute_script call,
+        # the per-element functions are used as a fallback if the script fails
+        if self.graphql is not None:
+            # captured posts are visited by id, so their feed children are skipped before any field is read,
+            # children without a response, e.g. the first posts rendered into the html, are still extracted
+            self._extract_graphql()
+
+        if self.batch_extract:
+            records = sutils.extract_new_posts(self.driver, self.isGroup, self.feed_cursor)
+            if records is not None:
+                processed = len(records)
+                # trailing children without a link are not rendered yet, they are extracted on the next round
+                while processed > 0 and records[processed - 1].get('link_href') is None:
+                    processed -= 1
+                for record in records[:processed]:
+                    self._extract_record(record)
+                self.feed_cursor += processed
+                return
+            self.logger().info("Batch extraction failed, fall back to per-element extraction")
+
+        posts = sutils.find_new_posts(self.driver, self.isGroup, self.feed_cursor)
+        processed = len(posts)
+        # same trimming as the batch path, only the trailing children cost a round trip
+        while processed > 0 and not sutils.has_post_link(posts[processed - 1], self.isGroup):
+            processed -= 1
+        for post in posts[:processed]:
+            self._extract_post(post)
+        self.feed_cursor += processed
+
+    def _record_round(self, found, accepted):
+        # posts found after the cursor and accepted by this round, WebDriver commands spent per accepted post
+        self.logger().counter("posts_found_total", found)
+        self.logger().counter("posts_accepted_total", accepted)
+        stats = {"found": found, "accepted": accepted, "cursor": self.feed_cursor, "count": self.count}
+        if self.commands is not None:
+            stats["commands"] = self.commands.total
+            self.logger().counter("webdriver_commands_total", self.commands.total)
+            self.logger().histogram("commands_per_post", self.commands.total / max(accepted, 1), COUNT_BUCKETS)
+            self.commands.reset()
+        self.logger().metrics_log(stats)
+
+    def _compact_feed(self, processed):
+        stop = processed - self.compact_margin
+        if stop <= self.compacted:
+            return
+        compacted = sutils.compact_feed(self.driver, self.compacted, stop)
+        if compacted is not None:
+            self.logger().debug(f"Compacted {compacted} feed children before {stop}")
+            self.compacted = stop
+
+    def _save_snapshot(self):
+        # keeps page source so the feed can be re-extracted offline, see scraper.utils.html_snapshot
+        try:
+            snapshot_dir = join(data_path(), "snapshots")
+            os.makedirs(snapshot_dir, exist_ok=True)
+            file_path = join(snapshot_dir, f"{self.page_or_group_name}-{int(time.time() * 1000)}.html")
+            with open(file_path, "w", encoding="utf-8") as fd:
+                fd.write(self.driver.page_source)
+        except Exception as ex:
+            self.logger().exception(f"Failed to save page snapshot, error: {ex}")
+
+    def _scroll(self):
+        self.scroll_pacing.wait()
+        started_at = time.time()
+        new_posts = sutils.scroll_feed(self.driver, self.isGroup, self.scroll_batch, self.scroll_timeout)
+        if new_posts is None:
+            # keyboard scrolling with its fixed sleep is the fallback
+            sutils.scroll_down(self.driver)
+        else:
+            self.logger().debug(f"Scroll loaded {new_posts} posts in {time.time() - started_at:.2f}s")
+            self.logger().histogram("scroll_new_posts", new_posts, COUNT_BUCKETS)
+        self.scrolls += 1
+        self.scroll_seconds += time.time() - started_at
+        self.logger().histogram("scroll_seconds", time.time() - started_at)
+
+    def request_stop(self):
+        # stops scrolling after the current round, state is checkpointed and the run can be resumed
+        self.stop_event.set()
+        self.enricher is not None and self.enricher.cancel()
+
+    def elapsed(self) -> float:
+        return self.elapsed_before + (time.time() - self.run_started_at if self.run_started_at else 0.0)
+
+    def is_interrupted(self) -> bool:
+        # stopped or out of budget, the run is checkpointed to be resumed and posts.csv is not saved
+        return self.stop_event.is_set() or self.max_runtime is not None and self.elapsed() > self.max_runtime
+
+    def _should_stop(self) -> bool:
+        if self.stop_event.is_set():
+            return True
+        if self.is_interrupted():
+            self.logger().info("Run budget is exhausted")
+            return True
+        return False
+
+    def state(self) -> dict:
+        return {
+            "page_or_group_name": self.page_or_group_name,
+            "count": self.count,
+            "feed_cursor": self.feed_cursor,
+            "elapsed": self.elapsed(),
+            "pending_profiles": dict(self.pending_profiles),
+            "visited_profiles": dict(self.visited_profiles),
+            "data_dct": dict(self.data_dct),
+            "sink_offset": self.sink.start_offset if self.sink is not None else None,
+        }
+
+    def restore(self, state: dict):
+        # continues the run saved by save_checkpoint
+        self.count = state["count"]
+        self.feed_cursor = state["feed_cursor"]
+        self.elapsed_before = state["elapsed"]
+        self.pending_profiles = state["pending_profiles"]
+        self.visited_profiles = state.get("visited_profiles", {})
+        self.data_dct = state["data_dct"]
+        if self.sink is not None and state.get("sink_offset") is not None:
+            self.sink.start_offset = state["sink_offset"]
+        self.logger().info(f"Resume from checkpoint: {self.count} posts, feed cursor {self.feed_cursor}, "
+                           f"{len(self.pending_profiles)} pending profiles, elapsed {self.elapsed_before:.0f}s")
+
+    def save_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        self._commit()
+        self.checkpoint.save(self.state())
+        # without a sink the posts are durable from here, in data_dct of the checkpoint
+        self.sink is None and self.seen_index.commit()
+
+    def _fast_forward(self):
+        # a resumed run starts at the top of the feed, scroll without extraction until the cursor is loaded again,
+        # every scroll returns once a page is loaded instead of waiting for all posts up to the cursor
+        loaded = sutils.count_posts(self.driver, self.isGroup)
+        while loaded < self.feed_cursor and not self._should_stop():
+            new_posts = sutils.scroll_feed(self.driver, self.isGroup, self.scroll_batch, self.scroll_timeout)
+            if new_posts is None:
+                # the script failed, not the feed: the cursor is kept and the rounds scroll on to it,
+                # children before the cursor are not extracted again
+                self.logger().info(f"Fast forward stopped at {loaded} posts, scroll script failed")
+                return
+            if new_posts == 0:
+                self.logger().info(f"Feed ended at {loaded} posts before the resumed cursor {self.feed_cursor}")
+                self.feed_cursor = loaded
+                return
+            loaded += new_posts
+            self.compact_feed and self._compact_feed(min(loaded, self.feed_cursor))
+
+    def _install_graphql(self):
+        if self.graphql is None:
+            self.graphql = GraphQLCapture(self.driver, self.graphql_record_dir)
+        # a recycled browser keeps the capture, so posts are deduplicated over the whole run
+        self.graphql.driver = self.driver
+        if not self.graphql.install():
+            self.logger().info("Driver does not capture requests, posts are extracted from the DOM")
+            self.graphql = None
+
+    def _recycle_driver(self, reason) -> bool:
+        # replaces the feed browser, restores the saved session and scrolls back to the cursor,
+        # posts loaded again are skipped by visited_posts. Returns False if the feed did not load
+        self.logger().info(f"Recycling browser: {reason}")
+        self.supervisor.on_restart()
+        self.logger().counter("browser_restarts_total")
+        sutils.close_driver(self.driver)
         self._init_driver()
+        self.capture_graphql and self._install_graphql()
+        self._open_session(self.driver)
+        self._handle_popup()
+        elements_have_loaded = sutils.wait_for_element_to_appear(self.driver, self.timeout)
+        self.feed_cursor > 0 and elements_have_loaded and self._fast_forward()
+        return elements_have_loaded
 
-        self.driver.get(self.URL)
+    def _restart_driver(self, reason) -> bool:
+        # a recycle failing to start the browser or to open the feed is retried while restarts are left
+        while True:
+            try:
+                return self._recycle_driver(reason)
+            except Exception as ex:
+                if not self.supervisor.can_restart():
+                    self._abort(ex)
+                reason = f"recycle failed, {type(ex).__name__}: {ex}"
+
+    def _abort(self, ex):
+        # the run is checkpointed to be resumed instead of being lost
+        self.logger().exception(f"Browser failed, error: {ex}")
+        self.save_checkpoint()
+        sutils.close_driver(self.driver)
+        raise ex
+
+    def _crawl_round(self, start_at):
+        found_posts = 0
+        while found_posts < self.posts_count:
+            if self._should_stop():
+                # posts loaded so far are still extracted and committed by this round
+                break
+            self._handle_popup()
+            found_posts = sutils.count_posts(self.driver, self.isGroup)
+            start_at = self.sleep(start_at)
+            self._scroll()
 
-        sutils.accept_cookies(self.driver)
-        # pass login and pass
-        self.username is not None and sutils.login(self.driver, self.username, self.password)
+        self._handle_popup()
 
-        # sometimes we get popup that says "your request couldn't be processed", however
-        # posts are loading in background if popup is closed, so call this method in case if it pops up.
-        sutils.close_error_popup(self.driver)
+        self.logger().info(f"Processed {self.count} posts 🎊 continue...")
+
+        cursor, count = self.feed_cursor, self.count
+        self._extract_posts()
+        self._record_round(self.feed_cursor - cursor, self.count - count)
+        self._apply_profile_results()
+        self.compact_feed and self._compact_feed(self.feed_cursor)
+        self._commit()
+        self.save_snapshots and self._save_snapshot()
+        self.checkpoint is not None and self.checkpoint.is_due() and self.save_checkpoint()
+
+        start_at = self.sleep(start_at)
+        self._scroll()
+        return start_at
+
+    def reach_timeout(self, start_time, current_time) -> bool:
+        return (current_time - start_time) > self.timeout
 
+    def parse_page(self, url: str, name: str):
+        self._init_driver()
+        self._open_session(self.driver)
         self._handle_popup()
 
         self.driver.get(url)
@@ -130,90 +598,123 @@ class FbScraper:
         self.logger().info(f"Found images: {images}")
 
     def scrap_to_json(self):
+        self.profiler is not None and self.profiler.start()
+        try:
+            return self._scrape()
+        finally:
+            # time.sleep is given back to the process even if the run failed
+            self._report_profile()
+
+    def _scrape(self):
         self.logger().info("Scraping posts and saving them as JSON...")
+        started_at = self.run_started_at = time.time()
         self._init_driver()
-        start_at = time.time()
-
-        self.driver.get(self.URL)
-
-        sutils.accept_cookies(self.driver)
-        # pass login and pass
-        self.username is not None and sutils.login(self.driver, self.username, self.password)
-
-        # sometimes we get popup that says "your request couldn't be processed", however
-        # posts are loading in background if popup is closed, so call this method in case if it pops up.
-        sutils.close_error_popup(self.driver)
+        self.capture_graphql and self._install_graphql()
+        restored = self._open_session(self.driver, self.startup_timings)
+        self.startup_latency = time.time() - started_at
+        timings = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.startup_timings.items())
+        self.logger().info(f"Browser session is ready in {self.startup_latency:.2f}s ({timings}), "
+                           f"restored session: {restored}")
+
+        if self.profile_workers > 0:
+            self.enricher = ProfileEnricher(self._new_profile_driver, workers=self.profile_workers,
+                                            timeout=self.timeout, pacing=self.profile_pacing,
+                                            on_result=lambda key, images: self.profile_results.put((key, images)))
+            # profiles left by the resumed run
+            for profile_url, item in self.pending_profiles.items():
+                self.enricher.submit(profile_url, item['name'], profile_url)
 
+        start_at = time.time()
         elements_have_loaded = sutils.wait_for_element_to_appear(self.driver, self.timeout)
-        sutils.scroll_down(self.driver)
+        self.feed_cursor > 0 and elements_have_loaded and self._fast_forward()
+        self._scroll()
         self._handle_popup()
 
-        while len(self.data_dct) < self.posts_count and elements_have_loaded:
-            found_posts = 0
-            while found_posts < self.posts_count:
-                self._handle_popup()
-                posts = sutils.find_all_posts(self.driver, self.isGroup)
-                found_posts = len(posts)
-                start_at = self.sleep(start_at)
-                sutils.scroll_down(self.driver)
-
-            self._handle_popup()
-            posts = sutils.find_all_posts(self.driver, self.isGroup)
-
-            self.logger().info(f"Processed {len(self.data_dct)} posts 🎊 continue...")
+        while self.count < self.posts_count and elements_have_loaded and not self._should_stop():
+            try:
+                start_at = self._crawl_round(start_at)
+            except WebDriverException as ex:
+                if self.supervisor is None or not self.supervisor.can_restart():
+                    self._abort(ex)
+                elements_have_loaded = self._restart_driver(f"{type(ex).__name__}: {ex}")
+                start_at = time.time()
+                continue
+
+            reason = self.supervisor is not None and self.supervisor.recycle_reason()
+            if reason:
+                elements_have_loaded = self._restart_driver(reason)
+                start_at = time.time()
+
+        self._enrich_profiles()
+        if self.graphql is not None:
+            self.logger().info(f"Captured {self.graphql.responses} GraphQL responses, "
+                               f"{self.graphql.duplicates} duplicated posts")
+        self._log_scroll_stats()
+
+        if self.is_interrupted():
+            # interrupted run keeps its checkpoint to be resumed
+            self.save_checkpoint()
+        else:
+            self._commit()
+            self.checkpoint is not None and self.checkpoint.clear()
+        sutils.close_driver(self.driver)
+        return json.dumps(self.data_dct, ensure_ascii=False)
 
-            for post in posts:
+    def _log_scroll_stats(self):
+        if self.scrolls == 0:
+            return
+        stats = f"{self.scrolls} scrolls, {self.scroll_seconds / self.scrolls:.2f}s per scroll"
+        if self.resource_policy is not None:
+            stats += f", {self.resource_policy.bytes_downloaded / self.scrolls / 1024:.0f} KB per scroll, " \
+                     f"{self.resource_policy.summary()}"
+        self.logger().info(f"Crawl stats: {stats}")
+
+    def _report_profile(self):
+        if self.profiler is None:
+            return
+        self.profiler.stop()
+        self.logger().info(f"WebDriver commands by function:\n{self.profiler.report()}")
+        self.profiler.folded_path is not None and self.profiler.write_folded()
+
+    def _commit(self):
+        # seen ids are committed only once their posts are durable: flush returns when the sink has written them,
+        # without a sink they are kept in data_dct and committed by save_checkpoint
+        if self.sink is None:
+            return
+        self.sink.flush()
+        self.seen_index.commit()
+
+    def _enrich_profiles(self):
+        if self.enricher is not None:
+            self.logger().info("Waiting for profile enrichment...")
+            self.enricher.join()
+            self._apply_profile_results()
+        else:
+            for profile_url, item in list(self.pending_profiles.items()):
+                if self._should_stop():
+                    break
+                started_at = time.time()
                 try:
-                    key, post_url, link_element = sutils.find_post_status(post, self.isGroup)
-
-                    if post_url is None or key in self.visited_posts:
-                        continue
-
-                    self.visited_posts.add(key)
-
-                    post_url = post_url.split('?')[0]
-                    name, profile_url = sutils.find_post_name(post)
-                    content = sutils.find_post_content(post, self.driver)
-                    group_images = sutils.find_post_image_url(post)
-                    create_at = sutils.find_post_time(
-                        post, link_element, self.driver, self.isGroup)
-
-                    if not name or name == 'Anonymous participant' or not content or not group_images:
-                        continue
-
-                    self.data_dct[key] = {
-                        "name": name,
-                        "profile_url": profile_url,
-                        "content": content,
-                        "post_url": post_url,
-                        "group_images": group_images,
-                        "create_at": create_at,
-                    }
+                    images = visit_profile(self.driver, item['name'], profile_url, self.timeout)
+                    if not images:
+                        self.logger().info(f"Not found profile image name: {item['name']} url: {profile_url}")
+                    self._set_profile_images(profile_url, images)
+                    self.logger().counter("profile_visits_total", status="ok" if images else "not_found")
+                    self.logger().histogram("profile_visit_seconds", time.time() - started_at)
+                    self.profile_pacing.wait()
                 except Exception as ex:
-                    self.logger().exception(f"Failed to process the post, error: {ex}")
+                    self.logger().info(f"Failed to parse user profile: {profile_url}, error: {ex}")
+                    self.logger().counter("profile_visits_total", status="failed")
 
-            start_at = self.sleep(start_at)
-            sutils.scroll_down(self.driver)
-
-        for key, item in self.data_dct.items():
-            try:
-                self.driver.get(item['profile_url'])
-                sutils.wait_for_element_to_appear(self.driver, self.timeout)
-                images = sutils.find_profile_image(self.driver, item['name'])
-                if not images:
-                    self.logger().info(f"Not found profile image name: {item['name']} url: {item['profile_url']}")
-                self.data_dct[key]['profile_images'] = images
-                time.sleep(3.0)
-            except Exception as ex:
-                self.logger().info(f"Failed to parse user profile: {item['profile_url']}, error: {ex}")
-
-        sutils.close_driver(self.driver)
-        return json.dumps(self.data_dct, ensure_ascii=False)
+        if self.profile_cache is not None:
+            self.profile_cache.save()
+            self.logger().info(f"Profile image cache: {self.profile_cache.hits} hits, "
+                               f"{self.profile_cache.misses} misses, {len(self.profile_cache)} entries")
 
     def sleep(self, start_at):
         if self.reach_timeout(start_at, time.time()):
             self.logger().info('Timeout...')
-            time.sleep(self.timeout)
+            self.stop_event.wait(self.timeout)
             return time.time()
         else:
             return start_at
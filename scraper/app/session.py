@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from os.path import exists, join
+from typing import List
+
+import scraper.utils.selenium_utils as sutils
+from scraper import data_path
+
+s_logger = None
+
+
+class SessionManager:
+    """
+    Keeps the authenticated cookie jar and the Firefox profile of an account under data/session,
+    so the next run can skip the login flow and popups while the session is still valid
+    """
+
+    def __init__(self, username: str, session_dir: str = None):
+        account = hashlib.sha1(str(username).encode("utf-8")).hexdigest()[:12]
+        self.session_dir = session_dir or join(data_path(), "session", account)
+        self.cookies_path = join(self.session_dir, "cookies.json")
+        self.profile_dir = join(self.session_dir, "profile")
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+    @classmethod
+    def logger(cls):
+        global s_logger
+        if s_logger is None:
+            s_logger = logging.getLogger(__name__)
+        return s_logger
+
+    def _load_cookies(self) -> List[dict]:
+        if not exists(self.cookies_path):
+            return []
+        try:
+            with open(self.cookies_path, mode='r', encoding='utf-8') as fd:
+                return json.load(fd)
+        except Exception as ex:
+            self.logger().error(f"Error at load session cookies: {ex}")
+            return []
+
+    def restore(self, driver, url) -> bool:
+        # restores the saved session on the opened url, returns False if the session has to be created again
+        if sutils.is_logged_in(driver):
+            return True
+
+        cookies = self._load_cookies()
+        if not cookies:
+            return False
+        for cookie in cookies:
+            try:
+                driver.add_cookie(cookie)
+            except Exception as ex:
+                self.logger().debug(f"Skip session cookie {cookie.get('name')}: {ex}")
+        driver.get(url)
+        if sutils.is_logged_in(driver):
+            return True
+
+        self.logger().info("Saved session is not valid anymore, login again...")
+        self.clear(driver)
+        driver.get(url)
+        return False
+
+    def save(self, driver):
+        # the feed and the profile drivers save the same account concurrently, each writes its own tmp file
+        tmp_path = f"{self.cookies_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, mode='w', encoding='utf-8') as fd:
+                json.dump(driver.get_cookies(), fd)
+            os.replace(tmp_path, self.cookies_path)
+        except Exception as ex:
+            self.logger().error(f"Error at save session cookies: {ex}")
+
+    def clear(self, driver=None):
+        if exists(self.cookies_path):
+            os.remove(self.cookies_path)
+        if driver is not None:
+            driver.delete_all_cookies()
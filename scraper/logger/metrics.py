@@ -0,0 +1,218 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from scraper.logger import log_encoder
+
+logger = logging.getLogger()
+
+PREFIX = "scraper_"
+
+# seconds, from a WebDriver round trip to a page load
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# observations kept per histogram for the quantiles of the summary
+RESERVOIR_SIZE = 1000
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    # buckets are exported to Prometheus, quantiles of the summary come from a uniform sample of the observations
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size: int = RESERVOIR_SIZE):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = None
+        self.reservoir_size = reservoir_size
+        self.samples = []
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.max = value if self.max is None else max(self.max, value)
+        # reservoir sampling, every observation is kept with the same probability
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.reservoir_size:
+                self.samples[index] = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        # nearest rank over the sample, exact while there are at most reservoir_size observations
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of the run, kept in memory and rendered in the Prometheus text format or as a
+    JSON summary. Nothing is recorded until enable is called, so the instrumented hot paths only check
+    a flag when metrics are off. const_labels are added to every series, e.g. the target of a pool process
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.const_labels: Dict[str, str] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, **const_labels):
+        self.enabled = True
+        self.const_labels = {name: str(value) for name, value in const_labels.items()}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=None, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets or DEFAULT_BUCKETS)
+            histogram.observe(value)
+
+    def render_prometheus(self) -> str:
+        const = tuple(sorted(self.const_labels.items()))
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels + const)} {_format_value(value)}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                        cumulative += count
+                        le = (("le", _format_value(bound)),)
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + const, le)} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels + const)} "
+                                 f"{_format_value(histogram.sum)}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels + const)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        # series are keyed by name, and by name{labels} for labelled ones
+        with self._lock:
+            return {
+                "labels": dict(self.const_labels),
+                "counters": {name + _format_labels(labels): value
+                             for name, series in self.counters.items() for labels, value in series.items()},
+                "histograms": {name + _format_labels(labels): histogram.summary()
+                               for name, series in self.histograms.items() for labels, histogram in series.items()},
+            }
+
+    def write_textfile(self, file_path: str):
+        # atomic, the textfile collector of node_exporter never reads a partial file
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode='w', encoding='utf-8') as fd:
+            fd.write(self.render_prometheus())
+        os.replace(tmp_path, file_path)
+
+    def write_summary(self, file_path: str):
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode='w', encoding='utf-8') as fd:
+            json.dump(self.summary(), fd, indent=2, default=log_encoder)
+        os.replace(tmp_path, file_path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class TextfileExporter:
+    # writes the registry to file_path every interval seconds, on stop once more and the JSON summary
+    # to summary_path, <file_path without extension>-summary.json by default
+    def __init__(self, file_path: str, interval: float = 15.0, summary_path: str = None,
+                 registry: MetricsRegistry = None):
+        self.file_path = file_path
+        self.interval = interval
+        self.summary_path = summary_path or os.path.splitext(file_path)[0] + "-summary.json"
+        self.registry = registry or REGISTRY
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.is_alive() and self._thread.join()
+        self._write()
+        try:
+            self.registry.write_summary(self.summary_path)
+        except OSError as ex:
+            logger.error(f"Failed to write metrics summary to {self.summary_path}: {ex}")
+
+    def _write(self):
+        try:
+            self.registry.write_textfile(self.file_path)
+        except OSError as ex:
+            logger.error(f"Failed to write metrics to {self.file_path}: {ex}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            started_at = time.time()
+            self._write()
+            logger.debug(f"Metrics written to {self.file_path} in {time.time() - started_at:.3f}s")
+
+
+def start_exporter(file_path: str, interval: float = 15.0, **const_labels) -> TextfileExporter:
+    # enables the registry of this process and exports it to file_path
+    REGISTRY.enable(**const_labels)
+    return TextfileExporter(file_path, interval).start()
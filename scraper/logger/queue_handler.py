@@ -0,0 +1,55 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+_listener: Optional[QueueListener] = None
+_handlers: List[logging.Handler] = []
+
+
+class StructQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them, only the message is rendered here
+    (and cached on the record, see StructLogRecord.getMessage) so later changes of the arguments do not
+    show up. The record is not copied, handlers of the listener still get exc_info
+    """
+
+    def prepare(self, record):
+        record.getMessage()
+        return record
+
+
+def start_queue_logging(logger: logging.Logger = None) -> QueueListener:
+    # moves the handlers of the logger (root by default) to a listener thread, the logger only enqueues
+    global _listener, _handlers
+    logger = logger or logging.getLogger()
+    stop_queue_logging(logger)
+    _handlers = list(logger.handlers)
+    records = queue.SimpleQueue()
+    for handler in _handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(StructQueueHandler(records))
+    _listener = QueueListener(records, *_handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_queue_logging(logger: logging.Logger = None):
+    # writes the queued records and gives the handlers back to the logger
+    global _listener, _handlers
+    if _listener is None:
+        return
+    logger = logger or logging.getLogger()
+    _listener.stop()
+    for handler in list(logger.handlers):
+        if isinstance(handler, StructQueueHandler):
+            logger.removeHandler(handler)
+    for handler in _handlers:
+        logger.addHandler(handler)
+    _listener = None
+    _handlers = []
+
+
+# records still queued at exit are written before logging shuts the handlers down
+atexit.register(stop_queue_logging)
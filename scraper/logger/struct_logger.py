@@ -1,7 +1,14 @@
 import json
 import logging
+from decimal import Decimal
 
 from scraper.logger import log_encoder
+from scraper.logger.metrics import REGISTRY
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 EVENT_LOG_LEVEL = 15
 METRICS_LOG_LEVEL = 14
@@ -9,15 +16,36 @@ logging.addLevelName(EVENT_LOG_LEVEL, "EVENT_LOG")
 logging.addLevelName(METRICS_LOG_LEVEL, "METRIC_LOG")
 
 
+def _decimals_to_str(value):
+    # ujson encodes Decimal as a number, json passes it to log_encoder
+    if isinstance(value, dict):
+        return {key: _decimals_to_str(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_decimals_to_str(item) for item in value]
+    return log_encoder(value) if isinstance(value, Decimal) else value
+
+
+def dumps_message(dict_msg: dict) -> str:
+    # same values as json.dumps(dict_msg, default=log_encoder), ujson writes them without spaces
+    if ujson is None:
+        return json.dumps(dict_msg, default=log_encoder)
+    return ujson.dumps(_decimals_to_str(dict_msg), default=log_encoder, escape_forward_slashes=False)
+
+
 class StructLogRecord(logging.LogRecord):
+    # rendered message, every handler formatting the record reuses it
+    _message = None
+
     def getMessage(self):
         """
         Return dict msg if present
         """
-        if "dict_msg" in self.__dict__ and isinstance(self.__dict__["dict_msg"], dict):
-            return json.dumps(self.__dict__["dict_msg"], default=log_encoder)
-        else:
-            return super().getMessage()
+        if self._message is None:
+            if "dict_msg" in self.__dict__ and isinstance(self.__dict__["dict_msg"], dict):
+                self._message = dumps_message(self.__dict__["dict_msg"])
+            else:
+                self._message = super().getMessage()
+        return self._message
 
 
 class StructLogger(logging.Logger):
@@ -36,3 +64,28 @@ class StructLogger(logging.Logger):
                 kwargs["extra"] = extra
 
             self._log(EVENT_LOG_LEVEL, "", args, **kwargs)
+
+    def metrics_log(self, dict_msg, *args, **kwargs):
+        if self.isEnabledFor(METRICS_LOG_LEVEL):
+            if not isinstance(dict_msg, dict):
+                self._log(logging.ERROR, "metrics_log message must be of type dict.", extra={"do_not_send": True})
+                return
+            extra = {
+                "dict_msg": dict_msg,
+                "message_type": "metrics"
+            }
+            if "extra" in kwargs:
+                kwargs["extra"].update(extra)
+            else:
+                kwargs["extra"] = extra
+
+            self._log(METRICS_LOG_LEVEL, "", args, **kwargs)
+
+    def counter(self, name: str, value: float = 1, **labels):
+        # recorded only once the registry is enabled, see scraper.logger.metrics
+        if REGISTRY.enabled:
+            REGISTRY.inc(name, value, **labels)
+
+    def histogram(self, name: str, value: float, buckets=None, **labels):
+        if REGISTRY.enabled:
+            REGISTRY.observe(name, value, buckets, **labels)
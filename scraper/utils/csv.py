@@ -2,8 +2,9 @@ import csv
 import logging
 import os
 from datetime import datetime
+from itertools import islice
 from os.path import exists, join
-from typing import Set
+from typing import Iterator, Set, Tuple
 
 import aiohttp
 
@@ -12,18 +13,28 @@ from scraper import data_path
 logger = logging.getLogger()
 
 
-def parse_csv(file_path: str) -> Set[str]:
-    res = set()
+def iter_post_ids(file_path: str) -> Iterator[str]:
+    with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row['id']
+
+
+def iter_csv_posts(file_path: str, start_offset: int = 0) -> Iterator[Tuple[str, dict]]:
+    # reads posts.csv lazily from the row start_offset, image columns are split back into lists
     with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for i, row in enumerate(reader):
-            if i == 0:
-                continue
-            res.add(row['id'])
-    return res
+        for row in islice(csv.DictReader(csvfile), start_offset, None):
+            key = row.pop('id')
+            for column in ('group_images', 'profile_images'):
+                row[column] = row.get(column, '').split()
+            yield key, row
+
+
+def parse_csv(file_path: str) -> Set[str]:
+    return set(iter_post_ids(file_path))
 
 
 def save_csv(data):
+    # data is a dict of posts keyed by id or an iterable of (id, post) pairs
     try:
         root_path = data_path()
         file_path = join(root_path, "posts.csv")
@@ -35,8 +46,7 @@ def save_csv(data):
             writer = csv.DictWriter(fd, fieldnames=fieldnames)
             if mode == 'w':
                 writer.writeheader()
-            for key in data:
-                post = data[key]
+            for key, post in (data.items() if isinstance(data, dict) else data):
                 writer.writerow({
                     'id': key,
                     'name': post.get('name', ''),
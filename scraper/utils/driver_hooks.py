@@ -0,0 +1,41 @@
+from collections import Counter
+
+
+class CommandExecutorProxy:
+    """
+    Wraps the command executor of a webdriver, every WebDriver round trip (driver and WebElement calls)
+    goes through `execute`, so subclasses can observe or replace the commands
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+
+    def __getattr__(self, name):
+        return getattr(self._executor, name)
+
+    def execute(self, command, params):
+        return self._executor.execute(command, params)
+
+
+class CommandCounter(CommandExecutorProxy):
+    def __init__(self, executor):
+        super().__init__(executor)
+        self.counts = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+    def execute(self, command, params):
+        self.counts[command] += 1
+        return super().execute(command, params)
+
+
+def install(driver, proxy_cls, *args, **kwargs):
+    # replaces driver command executor with the proxy and returns the proxy
+    proxy = proxy_cls(driver.command_executor, *args, **kwargs)
+    driver.command_executor = proxy
+    return proxy
@@ -0,0 +1,187 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from os.path import basename, dirname
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import scraper
+from scraper.utils import driver_hooks
+
+logger = logging.getLogger()
+
+SCRAPER_DIR = dirname(scraper.__file__)
+# command proxies between the caller and the driver, their frames are not part of the profiled stack
+IGNORED_FILES = {"driver_hooks.py", "driver_profiler.py", "driver_trace.py", "driver_supervisor.py"}
+WAIT_FILE = os.path.join("selenium", "webdriver", "support", "wait.py")
+
+KIND_COMMAND = "command"
+KIND_WAIT = "wait"
+KIND_SLEEP = "sleep"
+KINDS = (KIND_COMMAND, KIND_WAIT, KIND_SLEEP)
+
+
+def _frame_name(frame) -> str:
+    # FbScraper._extract_posts for methods, sutils.find_post_time for functions of selenium_utils
+    code = frame.f_code
+    if code.co_argcount and code.co_varnames[0] in ("self", "cls"):
+        owner = frame.f_locals.get(code.co_varnames[0])
+        if owner is not None:
+            return f"{(owner if isinstance(owner, type) else type(owner)).__name__}.{code.co_name}"
+    module = basename(code.co_filename)[:-3]
+    return f"{'sutils' if module == 'selenium_utils' else module}.{code.co_name}"
+
+
+class CommandProfiler(driver_hooks.CommandExecutorProxy):
+    # times every command of the driver and of its WebElements, which are sent through the same executor
+    def __init__(self, executor, profiler: "DriverProfiler"):
+        super().__init__(executor)
+        self.profiler = profiler
+
+    def execute(self, command, params):
+        local = self.profiler.local
+        if getattr(local, "in_command", False):
+            # sent by another command, e.g. a nested proxy, it is counted by the outer one
+            return super().execute(command, params)
+        local.in_command = True
+        started_at = time.perf_counter()
+        try:
+            return super().execute(command, params)
+        finally:
+            local.in_command = False
+            self.profiler.record(KIND_COMMAND, command, time.perf_counter() - started_at, sys._getframe(1))
+
+
+class DriverProfiler:
+    """
+    Attributes the time of WebDriver commands to the scraper functions issuing them. Every command is
+    bucketed by the stack of scraper frames (sutils functions, FbScraper methods) it was sent from.
+    Commands polled by a WebDriverWait and the polling sleeps are counted as wait time, time.sleep
+    called by the scraper as sleep time, so both are told apart from the real work.
+    report returns the functions sorted by their time, folded the stacks in the format of flamegraph.pl
+    """
+
+    def __init__(self, folded_path: str = None):
+        self.folded_path = folded_path
+        # (stack, kind, name) -> [count, seconds]
+        self.samples: Dict[Tuple[Tuple[str, ...], str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+        self.started_at = None
+        self.stopped_at = None
+        self._sleep = None
+        self._lock = threading.Lock()
+        # in_command is set while a command of the thread is sent, its sleeps are part of the command
+        self.local = threading.local()
+
+    def attach(self, driver) -> CommandProfiler:
+        return driver_hooks.install(driver, CommandProfiler, self)
+
+    def start(self):
+        # time.sleep is replaced for the whole process, sleeps without a scraper frame are not counted
+        if self._sleep is not None:
+            return
+        self.started_at = time.perf_counter()
+        self._sleep = time.sleep
+        original = self._sleep
+
+        def sleep(seconds):
+            if getattr(self.local, "in_command", False):
+                return original(seconds)
+            started_at = time.perf_counter()
+            try:
+                original(seconds)
+            finally:
+                self.record(KIND_SLEEP, "time.sleep", time.perf_counter() - started_at, sys._getframe(1))
+
+        time.sleep = sleep
+
+    def stop(self):
+        if self._sleep is None:
+            return
+        time.sleep = self._sleep
+        self._sleep = None
+        self.stopped_at = time.perf_counter()
+
+    @staticmethod
+    def _stack(frame) -> Tuple[Tuple[str, ...], bool]:
+        # scraper frames from the outermost one, and whether the frame was called by a WebDriverWait
+        names = []
+        in_wait = False
+        while frame is not None:
+            file_name = frame.f_code.co_filename
+            if file_name.endswith(WAIT_FILE):
+                if not in_wait:
+                    names.append(f"WebDriverWait.{frame.f_code.co_name}")
+                in_wait = True
+            elif file_name.startswith(SCRAPER_DIR) and basename(file_name) not in IGNORED_FILES:
+                names.append(_frame_name(frame))
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names), in_wait
+
+    def record(self, kind: str, name: str, seconds: float, frame):
+        stack, in_wait = self._stack(frame)
+        if kind == KIND_SLEEP and not stack:
+            return
+        kind = KIND_WAIT if in_wait else kind
+        with self._lock:
+            sample = self.samples[(stack, kind, name)]
+            sample[0] += 1
+            sample[1] += seconds
+
+    @staticmethod
+    def _function(stack: Tuple[str, ...]) -> str:
+        # innermost scraper function of the stack, waits are attributed to the function that waits
+        for name in reversed(stack):
+            if not name.startswith("WebDriverWait."):
+                return name
+        return "<other>"
+
+    def functions(self) -> List[dict]:
+        rows = {}
+        with self._lock:
+            samples = list(self.samples.items())
+        for (stack, kind, name), (count, seconds) in samples:
+            function = self._function(stack)
+            row = rows.setdefault(function, {"function": function, "commands": 0, "total": 0.0,
+                                             "top": defaultdict(float), **{kind: 0.0 for kind in KINDS}})
+            row[kind] += seconds
+            row["total"] += seconds
+            if kind != KIND_SLEEP:
+                row["commands"] += count if name != "time.sleep" else 0
+                row["top"][name] += seconds
+        return sorted(rows.values(), key=lambda row: row["total"], reverse=True)
+
+    def report(self, top: int = 25) -> str:
+        rows = self.functions()
+        totals = {kind: sum(row[kind] for row in rows) for kind in KINDS}
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at if self.started_at else None
+        lines = [f"{'function':<45} {'commands':>8} {'command s':>10} {'wait s':>8} {'sleep s':>8}  top commands"]
+        for row in rows[:top]:
+            commands = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in
+                                 sorted(row["top"].items(), key=lambda item: item[1], reverse=True)[:3])
+            lines.append(f"{row['function'][:45]:<45} {row['commands']:>8} {row[KIND_COMMAND]:>10.2f} "
+                         f"{row[KIND_WAIT]:>8.2f} {row[KIND_SLEEP]:>8.2f}  {commands}")
+        summary = f"commands {totals[KIND_COMMAND]:.2f}s, waits {totals[KIND_WAIT]:.2f}s, " \
+                  f"sleeps {totals[KIND_SLEEP]:.2f}s"
+        if elapsed is not None:
+            summary += f", other work {max(elapsed - sum(totals.values()), 0.0):.2f}s of {elapsed:.2f}s"
+        lines.append(summary)
+        return "\n".join(lines)
+
+    def folded(self) -> Iterator[str]:
+        # one line per stack, `frame;frame;leaf microseconds`, leaf is the command, WebDriverWait poll or sleep
+        with self._lock:
+            samples = list(self.samples.items())
+        for (stack, kind, name), (_, seconds) in sorted(samples):
+            leaf = name if kind != KIND_WAIT or name != "time.sleep" else "poll"
+            frames = ";".join(stack + (leaf,)).replace(" ", "_")
+            yield f"{frames} {int(seconds * 1e6)}"
+
+    def write_folded(self, file_path: Optional[str] = None):
+        file_path = file_path or self.folded_path
+        with open(file_path, mode='w', encoding='utf-8') as fd:
+            for line in self.folded():
+                fd.write(line + "\n")
+        logger.info(f"Folded stacks are saved to {file_path}, render them with flamegraph.pl")
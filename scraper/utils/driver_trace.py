@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from scraper.utils.driver_hooks import CommandExecutorProxy, install
+
+logger = logging.getLogger()
+
+# commands are matched this far ahead of the replay position, commands of the recording left out by the replay
+# (e.g. fewer polls of a WebDriverWait) are skipped
+LOOKAHEAD = 64
+
+
+def _is_error(entry: dict) -> bool:
+    # RemoteConnection returns the error responses of the browser with their HTTP status and the body as a string
+    response = entry.get("response", {})
+    value = response.get("value")
+    return ("error" in entry or response.get("status") not in (None, 0)
+            or isinstance(value, dict) and "error" in value)
+
+
+def _normalize(params) -> dict:
+    # the session id differs between recordings and tuples are lists once loaded from the trace,
+    # scripts are kept as digest only, e.g. get_attribute sends the same large atom on every call
+    params = {key: value for key, value in (params or {}).items() if key != 'sessionId'}
+    script = params.get('script')
+    if isinstance(script, str) and len(script) > 64:
+        params['script'] = "sha1:" + hashlib.sha1(script.encode('utf-8')).hexdigest()
+    return json.loads(json.dumps(params, default=str))
+
+
+class ReplayError(WebDriverException):
+    pass
+
+
+class CommandRecorder(CommandExecutorProxy):
+    """
+    Writes every command with its params and the raw response of the browser, i.e. found element ids,
+    attribute values and execute_script returns, to a gzipped JSON lines trace
+    """
+
+    def __init__(self, executor, trace_path: str, session: dict = None):
+        super().__init__(executor)
+        self.trace_path = trace_path
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._fd = gzip.open(trace_path, mode='wt', encoding='utf-8')
+        self._write({"type": "session", **(session or {})})
+
+    def _write(self, entry: dict):
+        with self._lock:
+            if not self._fd.closed:
+                self._fd.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str) + "\n")
+
+    def execute(self, command, params):
+        entry = {"type": "command", "command": command, "params": _normalize(params)}
+        try:
+            response = super().execute(command, params)
+        except Exception as ex:
+            self._write({**entry, "error": str(ex)})
+            raise
+        self._write({**entry, "response": response})
+        self.commands += 1
+        if command == Command.QUIT:
+            self.close()
+        return response
+
+    def close(self):
+        with self._lock:
+            if not self._fd.closed:
+                self._fd.close()
+                logger.info(f"Recorded {self.commands} WebDriver commands to {self.trace_path}")
+
+
+def record(driver, trace_path: str) -> CommandRecorder:
+    # starts recording the commands of the driver, the trace is closed on driver.quit()
+    session = {"session_id": driver.session_id, "capabilities": driver.capabilities}
+    return install(driver, CommandRecorder, trace_path, session)
+
+
+def load_trace(trace_path: str) -> Tuple[dict, List[dict]]:
+    # returns the session header and the recorded commands
+    session, commands = {}, []
+    with gzip.open(trace_path, mode='rt', encoding='utf-8') as fd:
+        for line in fd:
+            entry = json.loads(line)
+            if entry.pop("type") == "session":
+                session = entry
+            else:
+                commands.append(entry)
+    return session, commands
+
+
+class CommandReplayer:
+    """
+    Command executor serving the responses of a trace instead of a browser. Commands are served in the
+    recorded order, a command repeated beyond the recording gets the last response of the same command again.
+    Polls of a WebDriverWait are collapsed to their outcome, the first poll gets the response that ended
+    the recorded wait or raises TimeoutException if it timed out, so waits do not take their wall time
+    """
+
+    def __init__(self, trace_path: str):
+        self.trace_path = trace_path
+        self.session, self.commands = load_trace(trace_path)
+        self._keys = [self._key(entry["command"], entry["params"]) for entry in self.commands]
+        self.position = 0
+        self.served = 0
+        self.repeated = 0
+        self.skipped = 0
+        self._last: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        # recorded commands the replay did not reach
+        return len(self.commands) - self.position
+
+    def _key(self, command, params) -> str:
+        return json.dumps([command, params], sort_keys=True)
+
+    def _serve(self, entry: dict):
+        if "error" in entry:
+            raise WebDriverException(entry["error"])
+        return entry["response"]
+
+    def _serve_run(self, index: int, key: str):
+        end = index
+        while _is_error(self.commands[end]) and end + 1 < len(self.commands) and self._keys[end + 1] == key:
+            end += 1
+        self.position = end + 1
+        self.served += 1
+        entry = self._last[key] = self.commands[end]
+        if end > index and _is_error(entry):
+            raise TimeoutException(f"Recorded wait for {entry['command']} timed out")
+        return self._serve(entry)
+
+    def execute(self, command, params):
+        if command == Command.NEW_SESSION:
+            return {"value": {"sessionId": self.session.get("session_id") or "replay",
+                              "capabilities": self.session.get("capabilities") or {}}}
+        key = self._key(command, _normalize(params))
+        with self._lock:
+            stop = min(self.position + LOOKAHEAD, len(self.commands))
+            for index in range(self.position, stop):
+                if self._keys[index] == key:
+                    self.skipped += index - self.position
+                    return self._serve_run(index, key)
+            if key in self._last:
+                self.repeated += 1
+                entry = self._last[key]
+                if _is_error(entry):
+                    raise TimeoutException(f"Recorded wait for {command} timed out")
+                return self._serve(entry)
+        if command in (Command.CLOSE, Command.QUIT):
+            return {"value": None}
+        raise ReplayError(f"No recorded response for {command} at command {self.position} of {self.trace_path}")
+
+    def close(self):
+        # called by driver.quit() to close the connection to the browser, there is none
+        pass
+
+
+class ReplayDriver(WebDriver):
+    """
+    Remote WebDriver connected to a CommandReplayer, scrap_to_json and the selenium_utils functions run
+    against a recorded session without a browser
+    """
+
+    def __init__(self, trace_path: str):
+        self.replayer = CommandReplayer(trace_path)
+        super().__init__(command_executor=self.replayer, options=FirefoxOptions())
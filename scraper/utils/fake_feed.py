@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger()
+
+AUTHORS = 7
+
+POST_TEMPLATE = """
+<div>
+  <div aria-posinset="{index}" style="min-height: 320px">
+    <span><strong>Author {author}</strong></span>
+    <span><a attributionsrc="/" href="{base_url}/profile.php?id={author}">Author {author}</a></span>
+    <span><a role="link" href="{base_url}/groups/{group}/posts/{index}/?ref=feed">{index}h</a></span>
+    <div data-ad-preview="message"><div dir="auto">Synthetic post {index} content</div></div>
+    <div><img referrerpolicy="origin" src="{image_url}"></div>
+  </div>
+</div>
+"""
+
+FEED_TEMPLATE = """<html>
+<head><title>{group}</title></head>
+<body>
+<div role="feed">{posts}</div>
+<script>
+    // infinite scroll, the next page is fetched when the bottom of the feed gets into view
+    var offset = {offset};
+    var loading = false;
+    var feed = document.querySelector("div[role='feed']");
+
+    function loadMore() {{
+        if (loading || window.innerHeight + window.scrollY < document.body.scrollHeight - 1000) {{
+            return;
+        }}
+        loading = true;
+        fetch("/groups/{group}/feed?offset=" + offset)
+            .then(function (resp) {{ return resp.text(); }})
+            .then(function (html) {{
+                if (html) {{
+                    feed.insertAdjacentHTML("beforeend", html);
+                    offset += {page_size};
+                }}
+                loading = false;
+            }});
+    }}
+
+    window.addEventListener("scroll", loadMore);
+</script>
+</body>
+</html>
+"""
+
+PROFILE_TEMPLATE = """<html>
+<body>
+<svg aria-label="Author {author}" role="img" xmlns="http://www.w3.org/2000/svg"
+     xmlns:xlink="http://www.w3.org/1999/xlink" width="168" height="168">
+  <g><image xlink:href="{base_url}/images/avatar-{author}.svg" width="168" height="168"></image></g>
+</svg>
+</body>
+</html>
+"""
+
+IMAGE_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="64" height="64"><rect width="64" height="64"/></svg>"""
+
+
+def render_posts(start: int, stop: int, group: str = "bench", base_url: str = "https://facebook.com",
+                 image_url: str = "https://scontent.example.com/{index}.jpg") -> str:
+    # feed children at positions [start, stop), the post at position i has id i + 1
+    return "".join(POST_TEMPLATE.format(index=i, author=i % AUTHORS, group=group, base_url=base_url,
+                                        image_url=image_url.format(index=i))
+                   for i in range(start + 1, stop + 1))
+
+
+def synthetic_feed(posts: int, group: str = "bench", base_url: str = "https://facebook.com") -> str:
+    # static page with the whole feed, see FakeFeedServer for the paginated one
+    return f"<html><body><div role='feed'>{render_posts(0, posts, group, base_url)}</div></body></html>"
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    server: "_FeedHTTPServer"
+
+    def log_message(self, format, *args):
+        logger.debug(f"Fake feed {self.address_string()}: {format % args}")
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        feed = self.server.feed
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+
+        if len(parts) == 2 and parts[0] == "groups":
+            feed.count("page")
+            return self._send(200, feed.render_page(parts[1]))
+        if len(parts) == 3 and parts[0] == "groups" and parts[2] == "feed":
+            feed.count("feed")
+            time.sleep(feed.latency)
+            return self._send(200, feed.render_feed(parts[1], int(query.get("offset", ["0"])[0])))
+        if parts == ["profile.php"]:
+            feed.count("profile")
+            time.sleep(feed.latency)
+            return self._send(200, feed.render_profile(int(query.get("id", ["0"])[0])))
+        if len(parts) == 2 and parts[0] == "images":
+            feed.count("image")
+            return self._send(200, IMAGE_SVG, "image/svg+xml")
+        feed.count("not_found")
+        self._send(404, "")
+
+
+class _FeedHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    feed: "FakeFeedServer"
+
+
+class FakeFeedServer:
+    """
+    Local HTTP server of synthetic group feeds with the DOM shapes selenium_utils relies on, so the crawl
+    can be measured without Facebook. /groups/<name> serves the first page_size posts, the next pages are
+    fetched by infinite scroll from /groups/<name>/feed after latency seconds, up to posts in total.
+    Authors link to /profile.php?id=<n> with an svg avatar
+    """
+
+    def __init__(self, posts: int = 1000, page_size: int = 10, latency: float = 0.0, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.posts = posts
+        self.page_size = page_size
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = _FeedHTTPServer((host, port), _FeedHandler)
+        self._server.feed = self
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-feed-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Fake feed of {self.posts} posts is served at {self.base_url}")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def render_posts(self, group: str, start: int, stop: int) -> str:
+        return render_posts(start, min(stop, self.posts), group, self.base_url, self.base_url + "/images/{index}.svg")
+
+    def render_page(self, group: str) -> str:
+        return FEED_TEMPLATE.format(group=group, posts=self.render_posts(group, 0, self.page_size),
+                                    offset=self.page_size, page_size=self.page_size)
+
+    def render_feed(self, group: str, offset: int) -> str:
+        return self.render_posts(group, offset, offset + self.page_size)
+
+    def render_profile(self, author: int) -> str:
+        return PROFILE_TEMPLATE.format(author=author, base_url=self.base_url)
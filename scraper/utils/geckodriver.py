@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from os.path import exists, join
+from typing import Optional
+
+from scraper import data_path
+
+logger = logging.getLogger()
+
+_geckodriver_path: Optional[str] = None
+_lock = threading.Lock()
+
+
+def pinned_config_path() -> str:
+    return join(data_path(), "geckodriver.json")
+
+
+def is_executable(path) -> bool:
+    return path is not None and exists(path) and os.access(path, os.X_OK)
+
+
+def _read_pinned() -> Optional[str]:
+    try:
+        with open(pinned_config_path(), mode='r', encoding='utf-8') as fd:
+            return json.load(fd).get("path")
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        logger.error(f"Error at read pinned geckodriver: {ex}")
+        return None
+
+
+def _pin(path: str):
+    tmp_path = f"{pinned_config_path()}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode='w', encoding='utf-8') as fd:
+            json.dump({"path": path}, fd)
+        os.replace(tmp_path, pinned_config_path())
+    except Exception as ex:
+        logger.error(f"Error at pin geckodriver: {ex}")
+
+
+def resolve_geckodriver() -> str:
+    """
+    Returns geckodriver binary, resolved once per process. GECKODRIVER_PATH env, the binary pinned in
+    data/geckodriver.json and PATH are tried before the network bound webdriver-manager install,
+    whatever is found is pinned so other processes and runs reuse it offline
+    """
+    global _geckodriver_path
+    with _lock:
+        if _geckodriver_path is not None:
+            return _geckodriver_path
+
+        pinned = _read_pinned()
+        path = next((p for p in (os.getenv("GECKODRIVER_PATH"), pinned, shutil.which("geckodriver"))
+                     if is_executable(p)), None)
+        if path is None:
+            from webdriver_manager.firefox import GeckoDriverManager
+            path = GeckoDriverManager().install()
+        if path != pinned:
+            _pin(path)
+
+        _geckodriver_path = path
+        return path
@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import queue
+import re
+import time
+from datetime import datetime
+from os.path import join
+from typing import Iterator, List, Optional, Set, Tuple
+
+import scraper.utils.selenium_utils as sutils
+
+logger = logging.getLogger()
+
+# feed pages are loaded by XHR POSTs to this endpoint
+GRAPHQL_SCOPE = r".*facebook\.com/api/graphql/.*"
+
+IMAGE_KEYS = ("photo_image", "image", "large_share_image")
+
+
+def iter_payloads(body) -> Iterator[dict]:
+    # a response body is a JSON object or, for streamed (deferred) responses, one JSON object per line
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    body = body.strip()
+    if body.startswith("for (;;);"):
+        body = body[len("for (;;);"):]
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            logger.debug(f"Skip non JSON line of GraphQL response: {line[:80]}")
+
+
+def _find(node, key, accept=None):
+    # depth first search of the first value of key, accepted by accept if given
+    if isinstance(node, dict):
+        if node.get(key) is not None and (accept is None or accept(node[key])):
+            return node[key]
+        values = node.values()
+    elif isinstance(node, list):
+        values = node
+    else:
+        return None
+    for value in values:
+        found = _find(value, key, accept)
+        if found is not None:
+            return found
+    return None
+
+
+def _find_images(node, images: List[str]):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in IMAGE_KEYS and isinstance(value, dict) and value.get("uri"):
+                images.append(value["uri"])
+            elif key != "actors":
+                _find_images(value, images)
+    elif isinstance(node, list):
+        for value in node:
+            _find_images(value, images)
+    return images
+
+
+def iter_stories(node) -> Iterator[dict]:
+    # stories are the objects carrying post_id, stories attached to a story (shares) are part of it
+    if isinstance(node, dict):
+        if node.get("post_id") is not None and (node.get("__typename") in (None, "Story")):
+            yield node
+            return
+        for value in node.values():
+            yield from iter_stories(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from iter_stories(value)
+
+
+def parse_story(story: dict) -> Tuple[str, Optional[dict]]:
+    # returns post id and the post in the shape of sutils.build_post, None if the story misses required fields
+    key = str(story["post_id"])
+    actors = _find(story, "actors") or [{}]
+    actor = actors[0] if isinstance(actors, list) and actors else {}
+    # comet_sections nest the text as message.story.message.text, the outer message is a section
+    message = _find(story, "message", lambda value: not isinstance(value, dict) or "text" in value)
+    content = message.get("text") if isinstance(message, dict) else message
+    creation_time = _find(story, "creation_time")
+    create_at = datetime.fromtimestamp(creation_time).isoformat() if isinstance(creation_time, (int, float)) else ""
+    post_url = story.get("url") or _find(story, "permalink_url") or ""
+
+    post = sutils.build_post(actor.get("name"), actor.get("url") or actor.get("profile_url"), content,
+                             post_url.split('?')[0], list(dict.fromkeys(_find_images(story, []))), create_at)
+    picture = actor.get("profile_picture")
+    if post is not None and isinstance(picture, dict) and picture.get("uri"):
+        # author avatar comes with the story, the profile page does not have to be visited
+        post["profile_images"] = [picture["uri"]]
+    return key, post
+
+
+def parse_response_body(body) -> List[Tuple[str, dict]]:
+    posts = []
+    for payload in iter_payloads(body):
+        for story in iter_stories(payload):
+            try:
+                key, post = parse_story(story)
+            except Exception as ex:
+                logger.error(f"Error at parse GraphQL story: {ex}")
+                continue
+            if post is not None:
+                posts.append((key, post))
+    return posts
+
+
+def load_fixture(file_path: str) -> List[Tuple[str, dict]]:
+    # parses a response body saved by GraphQLCapture(record_dir=...)
+    with open(file_path, mode='rb') as fd:
+        return parse_response_body(fd.read())
+
+
+class GraphQLCapture:
+    """
+    Parses posts from the feed GraphQL responses of the selenium-wire driver. Responses are parsed by the
+    response interceptor on the proxy thread of selenium-wire, so no WebDriver command is sent and the browser
+    thread only collects the parsed posts. Post ids are deduplicated over the whole run.
+    Bodies are saved to record_dir to be used as fixtures of load_fixture
+    """
+
+    def __init__(self, driver, record_dir: str = None):
+        self.driver = driver
+        self.record_dir = record_dir
+        self.responses = 0
+        self.duplicates = 0
+        self._posts = queue.Queue()
+        self._seen: Set[str] = set()
+        self._chained = None
+        record_dir is not None and os.makedirs(record_dir, exist_ok=True)
+
+    def install(self) -> bool:
+        # returns False if the driver does not capture requests, e.g. the replay driver
+        if not hasattr(self.driver, "response_interceptor"):
+            return False
+        # an installed interceptor, e.g. the one of ResourcePolicy counting bytes, is still called
+        self._chained = self.driver.response_interceptor
+        self.driver.response_interceptor = self._intercept
+        return True
+
+    def _intercept(self, request, response):
+        from seleniumwire.utils import decode
+
+        self._chained is not None and self._chained(request, response)
+        if response.status_code != 200 or not response.body or not re.match(GRAPHQL_SCOPE, request.url):
+            return
+        try:
+            body = decode(response.body, response.headers.get('Content-Encoding', 'identity'))
+            self.record_dir is not None and self._record(body)
+            self._posts.put(parse_response_body(body))
+        except Exception as ex:
+            logger.error(f"Error at parse GraphQL response of {request.url}: {ex}")
+
+    def _record(self, body: bytes):
+        file_path = join(self.record_dir, f"graphql-{time.time_ns()}.json")
+        with open(file_path, mode='wb') as fd:
+            fd.write(body)
+
+    def collect(self) -> List[Tuple[str, dict]]:
+        # returns the posts of the responses intercepted since the last call
+        posts = []
+        while True:
+            try:
+                parsed = self._posts.get_nowait()
+            except queue.Empty:
+                break
+            self.responses += 1
+            for key, post in parsed:
+                if key in self._seen:
+                    self.duplicates += 1
+                    continue
+                self._seen.add(key)
+                posts.append((key, post))
+        # bodies are parsed already, the copies kept by selenium-wire are dropped
+        del self.driver.requests
+        return posts
@@ -0,0 +1,107 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from lxml import html
+
+import scraper.utils.selenium_utils as sutils
+
+logger = logging.getLogger()
+
+BASE_URL = "https://www.facebook.com/"
+
+
+# The functions below mirror the selectors of selenium_utils, but run against a parsed
+# driver.page_source snapshot instead of a live WebElement.
+
+def find_all_posts(doc, isGroup):
+    return doc.xpath("//div[@role='feed']/div" if isGroup else "//div[@role='article']")
+
+
+def find_post_status(post, isGroup):
+    # returns post id and post url, same resolution as sutils.find_post_status
+    return sutils.find_record_status(_status_record(post, isGroup), isGroup)
+
+
+def find_post_name(post):
+    name = post.xpath(".//strong")
+    profile = post.xpath(".//span/a[@attributionsrc]")
+    if not name or not profile:
+        return None
+    return name[0].text_content(), profile[0].get("href")
+
+
+def find_post_content(post):
+    # offline snapshot cannot click "see more" or fetch the passage, so it returns the text from the snapshot
+    message = post.xpath(".//*[@data-ad-preview='message']")
+    return message[0].text_content() if message else ""
+
+
+def find_post_image_url(post):
+    return [image.get("src") for image in post.xpath(".//div/img[@referrerpolicy]")]
+
+
+def extract_id_from_link(link):
+    return sutils.extract_id_from_link(link)
+
+
+def _status_record(post, isGroup):
+    record = {"link_href": None, "group_href": None, "time_label": None}
+    link = post.xpath(".//span/a[@role='link']" if isGroup else ".//span/a[@aria-label][@role='link']")
+    if link:
+        record["link_href"] = link[0].get("href")
+        record["time_label"] = link[0].get("aria-label")
+    for href in post.xpath(".//a/@href"):
+        if "/groups/" in href:
+            record["group_href"] = href
+            break
+    return record
+
+
+def extract_record(post, isGroup) -> dict:
+    # builds the same record as sutils.extract_posts returns for a live feed child
+    record = _status_record(post, isGroup)
+    name = find_post_name(post)
+    record["name"], record["profile_url"] = name if name else (None, None)
+    record["content"] = find_post_content(post)
+    record["passage_href"] = None
+    record["images"] = find_post_image_url(post)
+    return record
+
+
+def parse_snapshot(source: str, base_url: str = BASE_URL):
+    doc = html.fromstring(source, base_url=base_url)
+    # WebElement.get_attribute('href') returns absolute urls, do the same for the snapshot
+    doc.make_links_absolute(base_url)
+    return doc
+
+
+def extract_snapshot(source: str, isGroup: bool, base_url: str = BASE_URL) -> Dict[str, dict]:
+    # returns posts of the snapshot keyed by post id, in the same shape as FbScraper.data_dct
+    posts = {}
+    for post in find_all_posts(parse_snapshot(source, base_url), isGroup):
+        try:
+            record = extract_record(post, isGroup)
+            key, post_url = sutils.find_record_status(record, isGroup)
+            if post_url is None or key in posts:
+                continue
+            name, profile_url, content, group_images, create_at = sutils.find_record_fields(record, isGroup)
+            item = sutils.build_post(name, profile_url, content, post_url.split('?')[0], group_images, create_at)
+            if item is not None:
+                posts[key] = item
+        except Exception as ex:
+            logger.exception(f"Failed to process the snapshot post, error: {ex}")
+    return posts
+
+
+def extract_snapshot_file(file_path: str, isGroup: bool) -> Tuple[str, Dict[str, dict]]:
+    with open(file_path, mode='r', encoding='utf-8') as fd:
+        return file_path, extract_snapshot(fd.read(), isGroup)
+
+
+def extract_snapshots(file_paths: Iterable[str], isGroup: bool,
+                      workers: Optional[int] = None, chunksize: int = 16) -> Iterator[Tuple[str, Dict[str, dict]]]:
+    # parses saved snapshots across a process pool, yields (file_path, posts) in input order
+    file_paths = list(file_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(extract_snapshot_file, file_paths, [isGroup] * len(file_paths), chunksize=chunksize)
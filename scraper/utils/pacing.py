@@ -0,0 +1,47 @@
+import asyncio
+import time
+from random import uniform
+
+
+class Pacing:
+    """
+    Delay policy between two browser actions of one worker, the delay is drawn from [min_delay, max_delay]
+    so the request pattern keeps some jitter
+    """
+
+    def __init__(self, min_delay: float = 0.0, max_delay: float = None):
+        self.min_delay = min_delay
+        self.max_delay = min_delay if max_delay is None else max_delay
+
+    def delay(self) -> float:
+        return uniform(self.min_delay, self.max_delay)
+
+    def wait(self) -> float:
+        delay = self.delay()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """
+    Token bucket for coroutines, allows rate acquisitions per second with bursts up to burst
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import threading
+import time
+from os.path import exists, join
+from typing import Dict, List, Optional
+
+from scraper import data_path
+
+logger = logging.getLogger()
+
+
+class ProfileImageCache:
+    """
+    On-disk cache of profile url -> avatar image urls, entries expire after ttl seconds and
+    the oldest entries are evicted once the cache grows beyond max_entries
+    """
+
+    def __init__(self, file_path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.file_path = file_path or join(data_path(), "profile_images.json")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        if not exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, mode='r', encoding='utf-8') as fd:
+                self._entries = json.load(fd)
+        except Exception as ex:
+            logger.error(f"Error at load profile image cache {self.file_path}: {ex}")
+            self._entries = {}
+
+    def _is_expired(self, entry, now) -> bool:
+        return now - entry["updated_at"] > self.ttl
+
+    def get(self, profile_url: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(profile_url)
+            if entry is None or self._is_expired(entry, time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["images"]
+
+    def set(self, profile_url: str, images: List[str]):
+        # empty result usually means the profile page did not load, so it is not cached
+        if not images:
+            return
+        with self._lock:
+            self._entries[profile_url] = {"images": images, "updated_at": time.time()}
+
+    def evict(self):
+        with self._lock:
+            now = time.time()
+            self._entries = {url: entry for url, entry in self._entries.items() if not self._is_expired(entry, now)}
+            if len(self._entries) > self.max_entries:
+                newest = sorted(self._entries.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+                self._entries = dict(newest[:self.max_entries])
+
+    def save(self):
+        self.evict()
+        # processes of the orchestrator save the cache concurrently
+        tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        try:
+            with self._lock, open(tmp_path, mode='w', encoding='utf-8') as fd:
+                json.dump(self._entries, fd)
+            os.replace(tmp_path, self.file_path)
+        except Exception as ex:
+            logger.error(f"Error at save profile image cache {self.file_path}: {ex}")
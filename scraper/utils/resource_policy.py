@@ -0,0 +1,147 @@
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger()
+
+# requests extraction needs are never blocked
+DEFAULT_ALLOW = (
+    r"facebook\.com/api/graphql/",
+    r"facebook\.com/ajax/",
+)
+
+# blocked whatever their kind, e.g. tracking pixels
+DEFAULT_BLOCK = (
+    r"facebook\.com/tr[/?]",
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+)
+
+FIRST_PARTY_DOMAINS = ("facebook.com", "fbcdn.net", "fbsbx.com")
+
+MEDIA_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".mp4", ".webm", ".m4a", ".mp3")
+FONT_EXTENSIONS = (".woff", ".woff2", ".ttf", ".otf", ".eot")
+
+# Sec-Fetch-Dest of the request -> resource kind
+FETCH_DESTINATIONS = {
+    "image": "media",
+    "video": "media",
+    "audio": "media",
+    "track": "media",
+    "font": "font",
+    "script": "script",
+    "style": "style",
+    "document": "document",
+    "iframe": "document",
+}
+
+
+def resource_kind(url: str, headers) -> str:
+    destination = FETCH_DESTINATIONS.get((headers.get("Sec-Fetch-Dest") or "").lower())
+    if destination is not None:
+        return destination
+    path = urlparse(url).path.lower()
+    if path.endswith(MEDIA_EXTENSIONS):
+        return "media"
+    if path.endswith(FONT_EXTENSIONS):
+        return "font"
+    if path.endswith(".js"):
+        return "script"
+    return "other"
+
+
+class ResourcePolicy:
+    """
+    Blocks resources the extraction does not need: media and fonts are not loaded by the browser prefs and
+    stubbed by the selenium-wire request interceptor, scripts of third party domains are stubbed as well.
+    Only the src attributes of images are read, so image bytes are never needed. Requests matching `allow`
+    pass, requests matching `block` are stubbed whatever their kind. Downloaded and saved bytes are counted
+    by the response interceptor
+    """
+
+    def __init__(self, block_media: bool = True, block_fonts: bool = True, block_third_party_scripts: bool = True,
+                 allow: Iterable[str] = DEFAULT_ALLOW, block: Iterable[str] = DEFAULT_BLOCK,
+                 first_party: Iterable[str] = FIRST_PARTY_DOMAINS):
+        self.block_media = block_media
+        self.block_fonts = block_fonts
+        self.block_third_party_scripts = block_third_party_scripts
+        self.allow = [re.compile(pattern) for pattern in allow]
+        self.block = [re.compile(pattern) for pattern in block]
+        self.first_party = tuple(first_party)
+        self.bytes_downloaded = 0
+        self.downloaded = Counter()
+        self.blocked = Counter()
+        self._lock = threading.Lock()
+
+    def prefs(self) -> Dict[str, object]:
+        # Firefox prefs set by Init.set_properties, blocked resources are not even requested
+        prefs = {
+            # requests to the local fake feed go through the selenium-wire proxy as well
+            "network.proxy.allow_hijacking_localhost": True,
+        }
+        if self.block_media:
+            prefs.update({
+                "permissions.default.image": 2,
+                "media.autoplay.default": 5,
+                "media.preload.default": 0,
+                "media.preload.auto": 0,
+            })
+        if self.block_fonts:
+            prefs.update({
+                "gfx.downloadable_fonts.enabled": False,
+                "browser.display.use_document_fonts": 0,
+            })
+        return prefs
+
+    def _is_first_party(self, url: str) -> bool:
+        host = urlparse(url).hostname or ""
+        return host in ("localhost", "127.0.0.1") or any(
+            host == domain or host.endswith("." + domain) for domain in self.first_party)
+
+    def blocked_kind(self, url: str, headers) -> Optional[str]:
+        # returns the kind of the resource if the request has to be blocked
+        if any(pattern.search(url) for pattern in self.allow):
+            return None
+        kind = resource_kind(url, headers)
+        if any(pattern.search(url) for pattern in self.block):
+            return kind
+        if kind == "media" and self.block_media or kind == "font" and self.block_fonts:
+            return kind
+        if kind == "script" and self.block_third_party_scripts and not self._is_first_party(url):
+            return kind
+        return None
+
+    def request_interceptor(self, request):
+        kind = self.blocked_kind(request.url, request.headers)
+        if kind is None:
+            return
+        with self._lock:
+            self.blocked[kind] += 1
+        content_type = "application/javascript" if kind == "script" else "text/plain"
+        request.create_response(status_code=200 if kind == "script" else 204,
+                                headers={"Content-Type": content_type}, body=b"")
+
+    def response_interceptor(self, request, response):
+        size = len(response.body or b"")
+        with self._lock:
+            self.bytes_downloaded += size
+            self.downloaded[resource_kind(request.url, request.headers)] += size
+
+    def install(self, driver) -> bool:
+        # returns False if the driver does not intercept requests, e.g. the replay driver
+        if not hasattr(driver, "request_interceptor"):
+            return False
+        driver.request_interceptor = self.request_interceptor
+        driver.response_interceptor = self.response_interceptor
+        return True
+
+    def summary(self) -> str:
+        with self._lock:
+            downloaded = ", ".join(f"{kind} {size / 1024:.0f} KB" for kind, size in self.downloaded.most_common())
+            blocked = ", ".join(f"{kind} {count}" for kind, count in self.blocked.most_common())
+            return f"downloaded {self.bytes_downloaded / 1024 / 1024:.2f} MB ({downloaded or 'nothing'}), " \
+                   f"blocked requests: {blocked or 'none'}"
@@ -0,0 +1,58 @@
+import logging
+import sqlite3
+from os.path import exists, join
+
+import scraper.utils.csv as csvutils
+from scraper import data_path
+
+logger = logging.getLogger()
+
+
+class SeenPostIndex:
+    """
+    On-disk index of accepted post ids, membership is answered by the sqlite primary key
+    so nothing of the saved posts is loaded into memory
+    """
+
+    def __init__(self, file_path: str = None, commit_every: int = 0):
+        self.file_path = file_path or join(data_path(), "seen_posts.sqlite")
+        # 0 commits only on explicit commit, so ids are not persisted before their posts are saved
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(self.file_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen_posts (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._conn.commit()
+
+    def __contains__(self, key) -> bool:
+        return self._conn.execute("SELECT 1 FROM seen_posts WHERE id = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM seen_posts").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM seen_posts LIMIT 1").fetchone() is None
+
+    def add(self, key):
+        self._conn.execute("INSERT OR IGNORE INTO seen_posts (id) VALUES (?)", (key,))
+        self._uncommitted += 1
+        if self.commit_every and self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def import_csv(self, file_path: str):
+        # one time migration of the ids saved in posts.csv before the index existed
+        if not exists(file_path) or not self.is_empty():
+            return
+        self._conn.executemany("INSERT OR IGNORE INTO seen_posts (id) VALUES (?)",
+                               ((key,) for key in csvutils.iter_post_ids(file_path)))
+        self.commit()
+        logger.info(f"Imported {len(self)} seen posts from {file_path}")
+
+    def close(self):
+        self.commit()
+        self._conn.close()
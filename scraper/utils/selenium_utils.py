@@ -1,6 +1,5 @@
 import logging
 import re
-import sys
 import time
 import urllib.request
 from datetime import datetime, timedelta
@@ -71,6 +70,13 @@ def convert_to_iso(t):
     return past_date
 
 
+class BrowserError(WebDriverException):
+    """
+    The browser does not respond as the page expects, the run can continue with a new browser,
+    see DriverSupervisor
+    """
+
+
 def close_driver(driver):
     try:
         driver.close()
@@ -105,9 +111,9 @@ def scroll_down_half(driver):
         driver.execute_script(
             "window.scrollTo(0, document.body.scrollHeight / 2);")
     except Exception as ex:
-        close_driver(driver)
         logger.error(
             "Error at scroll_down_half method : {}".format(ex))
+        raise BrowserError(f"scroll_down_half failed: {ex}") from ex
 
 
 def close_modern_layout_signup_modal(driver):
@@ -136,9 +142,65 @@ def scroll_down(driver):
         # driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         # close_modern_layout_signup_modal(driver)
     except Exception as ex:
-        # if any error occured than close the driver and exit
-        close_driver(driver)
+        # the caller decides whether the browser is replaced
         logger.error("Error at scroll_down method : {}".format(ex))
+        raise BrowserError(f"scroll_down failed: {ex}") from ex
+
+
+SCROLL_FEED_JS = """
+    // Scrolls to the bottom and resolves as soon as minNew posts are added to the feed or the deadline passes
+    var selector = arguments[0];
+    var minNew = arguments[1];
+    var timeoutMs = arguments[2];
+    var done = arguments[arguments.length - 1];
+
+    function count() {
+        return document.querySelectorAll(selector).length;
+    }
+
+    var start = count();
+    var feed = document.querySelector("div[role='feed']");
+    var finished = false;
+    var observer = new MutationObserver(function () {
+        if (count() - start >= minNew) {
+            finish();
+        }
+    });
+    var timer = setTimeout(finish, timeoutMs);
+
+    function finish() {
+        if (finished) {
+            return;
+        }
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        done(count() - start);
+    }
+
+    observer.observe(feed || document.body, {childList: true, subtree: !feed});
+    window.scrollTo(0, document.body.scrollHeight);
+"""
+
+
+def posts_selector(isGroup):
+    return "div[role='feed'] > div" if isGroup else 'div[role="article"]'
+
+
+def post_link_selector(isGroup):
+    # status link of a post, also read by EXTRACT_POSTS_JS as link_href
+    return 'span > a[role="link"]' if isGroup else 'span > a[aria-label][role="link"]'
+
+
+def scroll_feed(driver, isGroup, min_new=1, timeout=10):
+    # scrolls down and waits for new posts with a MutationObserver instead of a fixed sleep,
+    # returns count of new posts or None if the script failed
+    try:
+        driver.set_script_timeout(timeout + 5)
+        return driver.execute_async_script(SCROLL_FEED_JS, posts_selector(isGroup), min_new, int(timeout * 1000))
+    except Exception as ex:
+        logger.error("Error at scroll_feed method : {}".format(ex))
+        return None
 
 
 def close_popup(driver):
@@ -222,9 +284,7 @@ def find_post_status(post, isGroup):
         status_link = None
         status = None
 
-        link = post.find_element(
-            By.CSS_SELECTOR, 'span > a[role="link"]' if isGroup else 'span > a[aria-label][role="link"]'
-        )
+        link = post.find_element(By.CSS_SELECTOR, post_link_selector(isGroup))
         if link is not None:
             status_link = link.get_attribute("href")
             status = extract_id_from_link(status_link)
@@ -373,6 +433,15 @@ def find_post_time(post, link_element, driver, isGroup):
         return timestamp
 
 
+def has_post_link(post, isGroup):
+    # False while the post is not rendered yet, same check as the link_href of the extract_posts records
+    try:
+        return len(post.find_elements(By.CSS_SELECTOR, post_link_selector(isGroup))) > 0
+    except Exception as ex:
+        logger.exception("Error at has_post_link method : {}".format(ex))
+        return False
+
+
 def find_post_image_url(post):
     # finds all image of the facebook post
     try:
@@ -394,22 +463,213 @@ def find_post_image_url(post):
     return sources
 
 
+EXTRACT_POSTS_JS = """
+    // Runs the selectors of find_post_status, find_post_name, find_post_content, find_post_image_url
+    // and find_post_time for every given feed child and returns plain JSON records
+    var posts = arguments[0];
+    var isGroup = arguments[1];
+
+    function href(link) {
+        var value = link.href;
+        return typeof value === 'string' ? value : link.getAttribute('href');
+    }
+
+    return posts.map(function (post) {
+        var record = {
+            link_href: null, group_href: null, time_label: null, name: null, profile_url: null,
+            content: '', passage_href: null, images: []
+        };
+
+        var link = post.querySelector(isGroup ? 'span > a[role="link"]' : 'span > a[aria-label][role="link"]');
+        if (link) {
+            record.link_href = href(link);
+            record.time_label = link.getAttribute('aria-label');
+        }
+        var links = post.getElementsByTagName('a');
+        for (var i = 0; i < links.length; i++) {
+            var value = href(links[i]);
+            if (value && value.indexOf('/groups/') !== -1) {
+                record.group_href = value;
+                break;
+            }
+        }
+
+        var name = post.querySelector('strong');
+        var profile = post.querySelector('span > a[attributionsrc]');
+        if (name && profile) {
+            record.name = name.textContent;
+            record.profile_url = href(profile);
+        }
+
+        var message = post.querySelector('[data-ad-preview="message"]');
+        if (message) {
+            var seeMore = message.querySelector('div[dir="auto"] > div[role]');
+            if (seeMore && seeMore.getAttribute('target')) {
+                record.passage_href = href(seeMore);
+            } else {
+                if (seeMore) {
+                    seeMore.click();
+                }
+                record.content = message.textContent;
+            }
+        }
+
+        var images = post.querySelectorAll('div > img[referrerpolicy]');
+        for (var j = 0; j < images.length; j++) {
+            record.images.push(images[j].src);
+        }
+        return record;
+    });
+"""
+
+
+EXTRACT_NEW_POSTS_JS = """
+    var posts = Array.prototype.slice.call(document.querySelectorAll(arguments[0]), arguments[2]);
+    return (function () {
+""" + EXTRACT_POSTS_JS + """
+    }).apply(null, [posts, arguments[1]]);
+"""
+
+
+def extract_new_posts(driver, isGroup, start):
+    # same as extract_posts for the posts from start index of the feed, so posts are not sent back and forth
+    try:
+        return driver.execute_script(EXTRACT_NEW_POSTS_JS, posts_selector(isGroup), isGroup, start)
+    except Exception as ex:
+        logger.exception("Error at extract_new_posts method : {}".format(ex))
+        return None
+
+
+def extract_posts(driver, posts, isGroup):
+    # extracts every field of the given posts in a single round trip, returns list of plain dict records
+    # or None if the script failed and the caller has to fall back to the per-element functions
+    if not posts:
+        return []
+    try:
+        return driver.execute_script(EXTRACT_POSTS_JS, posts, isGroup)
+    except Exception as ex:
+        logger.exception("Error at extract_posts method : {}".format(ex))
+        return None
+
+
+def parse_post_time(aria_label_value):
+    try:
+        return (
+            parse(aria_label_value).isoformat()
+            if len(aria_label_value) > 5
+            else convert_to_iso(aria_label_value)
+        )
+    except Exception:
+        return ""
+
+
+def find_record_status(record, isGroup):
+    # same resolution as find_post_status, but over the record returned by extract_posts
+    status_link = record.get('link_href')
+    if status_link is None:
+        return "NA", None
+    status = extract_id_from_link(status_link)
+    if not isGroup and status:
+        return status, status_link
+    group_href = record.get('group_href')
+    if group_href:
+        return extract_id_from_link(group_href), group_href
+    return status, status_link
+
+
+def find_record_fields(record, isGroup):
+    # returns name, profile_url, content, images and time of the record returned by extract_posts
+    content = record.get('content') or ""
+    if record.get('passage_href'):
+        try:
+            content = fetch_post_passage(record['passage_href'])
+        except Exception as ex:
+            logger.exception("Error at find_content method : {}".format(ex))
+            content = ""
+
+    # group timestamps are hidden in a shadowDOM element, see find_post_time
+    create_at = "" if isGroup or not record.get('time_label') else parse_post_time(record['time_label'])
+    return record.get('name'), record.get('profile_url'), content, record.get('images') or [], create_at
+
+
+def build_post(name, profile_url, content, post_url, group_images, create_at):
+    # returns post dict or None if the post misses fields required to be saved
+    if not name or name == 'Anonymous participant' or not content or not group_images:
+        return None
+    return {
+        "name": name,
+        "profile_url": profile_url,
+        "content": content,
+        "post_url": post_url,
+        "group_images": group_images,
+        "create_at": create_at,
+    }
+
+
 def find_all_posts(driver, isGroup):
     # finds all posts of the facebook page
     try:
         # all_posts = driver.find_elements(By.CSS_SELECTOR, "div[role='feed'] > div")
         # different query selectors depending on if we are scraping a FB page or group
-        return driver.find_elements(By.CSS_SELECTOR,
-                                    "div[role='feed'] > div" if isGroup else 'div[role="article"]')
-    except NoSuchElementException:
-        logger.error("Cannot find any posts! Exiting!")
+        return driver.find_elements(By.CSS_SELECTOR, posts_selector(isGroup))
+    except NoSuchElementException as ex:
+        logger.error("Cannot find any posts!")
         # if this fails to find posts that means, code cannot move forward, as no post is found
-        close_driver(driver)
-        sys.exit(1)
+        raise BrowserError("Cannot find any posts") from ex
     except Exception as ex:
         logger.exception("Error at find_all_posts method : {}".format(ex))
-        close_driver(driver)
-        sys.exit(1)
+        raise BrowserError(f"find_all_posts failed: {ex}") from ex
+
+
+def find_new_posts(driver, isGroup, start):
+    # returns the posts from start index of the feed
+    try:
+        return driver.execute_script(
+            "return Array.prototype.slice.call(document.querySelectorAll(arguments[0]), arguments[1]);",
+            posts_selector(isGroup), start) or []
+    except Exception as ex:
+        logger.exception("Error at find_new_posts method : {}".format(ex))
+        return []
+
+
+COMPACT_FEED_JS = """
+    // Empties the feed children in [start, stop) and fixes their height, so the page keeps its scroll height
+    // and the infinite scroll keeps loading. The child itself stays in the feed, indexes of the feed cursor
+    // do not move and the page scripts still find the node they rendered
+    var posts = Array.prototype.slice.call(document.querySelectorAll(arguments[0]), arguments[1], arguments[2]);
+    posts = posts.filter(function (post) {
+        return !post.hasAttribute('data-compacted');
+    });
+    // heights are read before the first write, so the layout is computed once
+    var heights = posts.map(function (post) {
+        return post.getBoundingClientRect().height;
+    });
+    posts.forEach(function (post, i) {
+        post.textContent = '';
+        post.style.boxSizing = 'border-box';
+        post.style.height = heights[i] + 'px';
+        post.setAttribute('data-compacted', '');
+    });
+    return posts.length;
+"""
+
+
+def compact_feed(driver, start, stop):
+    # replaces the processed group feed children in [start, stop) with empty placeholders of the same height,
+    # returns count of compacted children or None if the script failed
+    try:
+        return driver.execute_script(COMPACT_FEED_JS, posts_selector(True), start, stop)
+    except Exception as ex:
+        logger.exception("Error at compact_feed method : {}".format(ex))
+        return None
+
+
+def count_posts(driver, isGroup):
+    try:
+        return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", posts_selector(isGroup))
+    except Exception as ex:
+        logger.exception("Error at count_posts method : {}".format(ex))
+        return 0
 
 
 def find_post_name(driverOrPost):
@@ -429,9 +689,27 @@ def find_post_name(driverOrPost):
         logger.exception("Error at __find_name method : {}".format(ex))
 
 
+def profile_image_selector(name):
+    return f"svg[aria-label='{name}'][role='img'] > g > image"
+
+
+def wait_for_profile_image(driver, name, timeout):
+    # wait for the avatar of the profile instead of the feed posts
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, profile_image_selector(name))))
+        return True
+    except WebDriverException:
+        logger.info(f"Profile image of {name} was not found!")
+        return False
+    except Exception as ex:
+        logger.error("Error at wait_for_profile_image method : {}".format(ex))
+        return False
+
+
 def find_profile_image(driver, name):
     try:
-        profile_img = driver.find_elements(By.CSS_SELECTOR, f"svg[aria-label='{name}'][role='img'] > g > image")
+        profile_img = driver.find_elements(By.CSS_SELECTOR, profile_image_selector(name))
         return [el.get_attribute("xlink:href") for el in profile_img]
     except Exception as ex:
         logger.exception("Error find_profile_image: {}".format(ex))
@@ -448,7 +726,7 @@ def accept_cookies(driver):
         pass
     except Exception as ex:
         logger.exception("Error at accept_cookies: {}".format(ex))
-        sys.exit(1)
+        raise BrowserError(f"accept_cookies failed: {ex}") from ex
 
 
 def login(driver, username, password):
@@ -489,3 +767,25 @@ def login(driver, username, password):
     except Exception as ex:
         logger.exception("Error at login: {}".format(ex))
         # sys.exit(1)
+
+
+def is_logged_in(driver):
+    # facebook sets c_user cookie for the authenticated user and shows no login form
+    try:
+        return driver.get_cookie("c_user") is not None and \
+            not driver.find_elements(By.CSS_SELECTOR, "input[name='email']")
+    except Exception as ex:
+        logger.error("Error at is_logged_in: {}".format(ex))
+        return False
+
+
+def wait_for_login(driver, timeout):
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.get_cookie("c_user") is not None)
+        return True
+    except WebDriverException:
+        logger.info("Login was not confirmed!")
+        return False
+    except Exception as ex:
+        logger.error("Error at wait_for_login: {}".format(ex))
+        return False
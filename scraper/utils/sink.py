@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from os.path import join
+from typing import Dict, Iterator, Optional, Tuple
+
+from scraper import data_path
+
+logger = logging.getLogger()
+
+
+class JsonlPostSink:
+    """
+    Appends every accepted post to a JSON lines file as soon as it is built, profile images found later
+    are appended as separate update records. Lines are flushed every flush_every records and
+    fsynced at most every fsync_interval seconds
+    """
+
+    def __init__(self, file_path: str = None, flush_every: int = 10, fsync_interval: float = 5.0):
+        self.file_path = file_path or join(data_path(), "posts.jsonl")
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+        self._fd = open(self.file_path, mode='a', encoding='utf-8')
+        # records of this run start here, the file keeps the previous runs
+        self.start_offset = self._fd.tell()
+        self._unflushed = 0
+        self._synced_at = time.time()
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict) -> int:
+        # returns the offset of the record in the file
+        with self._lock:
+            offset = self._fd.tell()
+            self._fd.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._flush(time.time() - self._synced_at >= self.fsync_interval)
+            return offset
+
+    def _flush(self, fsync: bool):
+        self._fd.flush()
+        self._unflushed = 0
+        if fsync:
+            os.fsync(self._fd.fileno())
+            self._synced_at = time.time()
+
+    def write_post(self, key: str, post: dict) -> int:
+        return self._write({"type": "post", "id": key, **post})
+
+    def write_update(self, key: str, fields: dict):
+        self._write({"type": "update", "id": key, **fields})
+
+    def read_post(self, offset: int) -> Optional[dict]:
+        # the post written at offset by write_post, without its update records
+        with self._lock:
+            self._fd.flush()
+        with open(self.file_path, mode='r', encoding='utf-8') as fd:
+            fd.seek(offset)
+            record = json.loads(fd.readline())
+        if record.pop("type", None) != "post":
+            return None
+        record.pop("id", None)
+        return record
+
+    def flush(self, fsync: bool = True):
+        with self._lock:
+            self._flush(fsync)
+
+    def close(self):
+        with self._lock:
+            if self._fd.closed:
+                return
+            self._flush(True)
+            self._fd.close()
+
+
+class AsyncQueueSink:
+    """
+    Hands posts from the scraper thread to an asyncio.Queue of the event loop, put blocks while the queue is full
+    so a slow consumer pushes back on scraping. A post waiting for its profile images is held until the update
+    arrives, at most max_held posts are held: beyond that the oldest one is released without its images, and
+    queued again with them once the update arrives, read back from the wrapped sink. max_held=0 releases
+    every post right away, e.g. when profiles are only visited after the crawl. Every post is also written
+    to the wrapped sink
+    """
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop, sink: JsonlPostSink = None,
+                 max_held: int = 100):
+        self.queue = queue
+        self.loop = loop
+        self.sink = sink
+        self.max_held = max_held
+        self.released = 0
+        self.resent = 0
+        # key -> post and its offset in the wrapped sink, insertion ordered, the first post is the oldest one
+        self._held: Dict[str, Tuple[dict, Optional[int]]] = {}
+        # key -> offset of the posts released without their profile images
+        self._released: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def start_offset(self):
+        return self.sink.start_offset if self.sink is not None else None
+
+    @start_offset.setter
+    def start_offset(self, value):
+        if self.sink is not None:
+            self.sink.start_offset = value
+
+    def _put(self, key: str, post: dict):
+        # queued item carries the time the post was built, so the consumer can measure latency per post
+        asyncio.run_coroutine_threadsafe(self.queue.put((key, post, time.time())), self.loop).result()
+
+    def write_post(self, key: str, post: dict):
+        offset = self.sink.write_post(key, post) if self.sink is not None else None
+        if "profile_images" in post:
+            self._put(key, post)
+            return
+        with self._lock:
+            self._held[key] = (post, offset)
+            oldest = next(iter(self._held)) if len(self._held) > self.max_held else None
+            released, offset = self._held.pop(oldest) if oldest is not None else (None, None)
+            if offset is not None:
+                self._released[oldest] = offset
+        if released is not None:
+            # put outside of the lock, it blocks while the queue is full
+            self.released += 1
+            self._put(oldest, released)
+
+    def write_update(self, key: str, fields: dict):
+        self.sink is not None and self.sink.write_update(key, fields)
+        with self._lock:
+            post, _ = self._held.pop(key, (None, None))
+            offset = self._released.pop(key, None) if post is None else None
+        if post is None and offset is not None:
+            # sent without the update already, the post is sent again with it
+            post = self.sink.read_post(offset)
+            self.resent += post is not None
+        if post is not None:
+            post.update(fields)
+            self._put(key, post)
+
+    def flush(self, fsync: bool = True):
+        self.sink is not None and self.sink.flush(fsync)
+
+    def close(self):
+        # posts whose profile was not found are released without profile images
+        with self._lock:
+            held, self._held = self._held, {}
+        for key, (post, _) in held.items():
+            self._put(key, post)
+        self.sink is not None and self.sink.close()
+
+
+def _iter_records(file_path: str, start_offset: int) -> Iterator[dict]:
+    with open(file_path, mode='r', encoding='utf-8') as fd:
+        fd.seek(start_offset)
+        for line in fd:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # the last line may be cut by a crash
+                logger.error(f"Skip broken record in {file_path}")
+
+
+def iter_posts(file_path: str, start_offset: int = 0) -> Iterator[Tuple[str, dict]]:
+    # yields (id, post) with the update records merged, only updates are kept in memory
+    updates: Dict[str, dict] = {}
+    for record in _iter_records(file_path, start_offset):
+        if record.pop("type", None) == "update":
+            updates.setdefault(record.pop("id"), {}).update(record)
+
+    for record in _iter_records(file_path, start_offset):
+        if record.pop("type", None) == "post":
+            key = record.pop("id")
+            record.update(updates.get(key, {}))
+            yield key, record
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from os.path import join
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from scraper import data_path
+
+logger = logging.getLogger()
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+HASHED_FIELDS = ('name', 'profile_url', 'content', 'post_url', 'group_images', 'profile_images', 'create_at')
+
+
+def content_hash(post: dict) -> str:
+    # hashes the fields saved to posts.csv, so a post scraped by main.py and replayed from the csv hash the same
+    values = []
+    for field in HASHED_FIELDS:
+        value = post.get(field) or ""
+        values.append(list(value) if isinstance(value, (list, tuple)) else str(value))
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class UploadLedger:
+    """
+    On-disk record of uploaded posts with the content hash, status and attempt count per post id.
+    A post is sent again only when it is new, its content changed or its last upload failed
+    """
+
+    def __init__(self, file_path: str = None):
+        self.file_path = file_path or join(data_path(), "upload_ledger.sqlite")
+        self.skipped = 0
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.file_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS uploads (id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, "
+                           "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL) WITHOUT ROWID")
+        self._conn.commit()
+
+    def should_send(self, key: str, post: dict, force: bool = False) -> bool:
+        # remembers the hash of a post to send until its outcome is recorded by on_result
+        digest = content_hash(post)
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash, status FROM uploads WHERE id = ?", (key,)).fetchone()
+            if not force and row is not None and row[0] == digest and row[1] == STATUS_SENT:
+                self.skipped += 1
+                return False
+            self._pending[key] = digest
+            return True
+
+    def on_result(self, keys: List[str], ok: bool):
+        status = STATUS_SENT if ok else STATUS_FAILED
+        now = time.time()
+        with self._lock:
+            rows = [(key, self._pending.pop(key), status, now) for key in keys if key in self._pending]
+            self._conn.executemany("INSERT INTO uploads (id, content_hash, status, attempts, updated_at) "
+                                   "VALUES (?, ?, ?, 1, ?) ON CONFLICT(id) DO UPDATE SET "
+                                   "content_hash = excluded.content_hash, status = excluded.status, "
+                                   "attempts = attempts + 1, updated_at = excluded.updated_at", rows)
+            self._conn.commit()
+
+    def status(self, key: str) -> Tuple[str, int]:
+        with self._lock:
+            row = self._conn.execute("SELECT status, attempts FROM uploads WHERE id = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row is not None else (STATUS_PENDING, 0)
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM uploads WHERE status = ?", (status,)).fetchone()[0]
+
+    def requeue_failures(self, posts: Iterable[Tuple[str, dict]]) -> Iterator[Tuple[str, dict]]:
+        # yields the posts whose last upload failed, to be passed to the uploader again
+        with self._lock:
+            failed = {row[0] for row in self._conn.execute("SELECT id FROM uploads WHERE status = ?",
+                                                           (STATUS_FAILED,))}
+        if not failed:
+            return
+        logger.info(f"Requeue {len(failed)} failed uploads")
+        for key, post in posts:
+            if key in failed:
+                failed.discard(key)
+                yield key, post
+        if failed:
+            logger.info(f"Not found {len(failed)} failed posts to requeue")
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
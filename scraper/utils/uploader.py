@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger()
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delay in seconds or HTTP date
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class UploadError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BatchUploader:
+    """
+    Uploads posts to SERVER_URL grouped into batches by count and byte size, as a JSON array or NDJSON body,
+    optionally gzipped. batch_size=1 sends a single JSON object, the same body as upload_data.
+    Failed requests are retried with jittered exponential backoff, Retry-After of the server is honoured.
+    on_result is called with the keys passed to add and the outcome of their batch
+    """
+
+    def __init__(self, server_url: str = None, batch_size: int = 50, max_batch_bytes: int = 512 * 1024,
+                 ndjson: bool = False, gzip_level: Optional[int] = None, connection_limit: int = 10,
+                 retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 30.0,
+                 on_result: Callable[[List[str], bool], None] = None):
+        self.server_url = server_url or os.getenv('SERVER_URL')
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.ndjson = ndjson
+        self.gzip_level = gzip_level
+        self.connection_limit = connection_limit
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.on_result = on_result
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._batch: List[Tuple[Optional[str], bytes]] = []
+        self._batch_bytes = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def open(self):
+        # fails before any post is queued, a batch could not be sent anywhere
+        if not self.server_url:
+            raise ValueError("Server url is not set, pass server_url or set SERVER_URL")
+        connector = aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300, keepalive_timeout=60,
+                                         enable_cleanup_closed=True)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout))
+        # bounds batches in flight, add waits for a free slot
+        self._semaphore = asyncio.Semaphore(self.connection_limit)
+
+    async def close(self):
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def add(self, post: dict, key: str = None):
+        encoded = json.dumps(post, ensure_ascii=False).encode('utf-8')
+        if self._batch and self._batch_bytes + len(encoded) > self.max_batch_bytes:
+            await self.flush()
+        self._batch.append((key, encoded))
+        self._batch_bytes += len(encoded)
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._batch:
+            return
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._send_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _body(self, batch: List[bytes]):
+        if self.batch_size == 1 and len(batch) == 1:
+            body, content_type = batch[0], 'application/json'
+        elif self.ndjson:
+            body, content_type = b"\n".join(batch) + b"\n", 'application/x-ndjson'
+        else:
+            body, content_type = b"[" + b",".join(batch) + b"]", 'application/json'
+        headers = {'Content-Type': content_type}
+        if self.gzip_level is not None:
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Retry-After of the server is capped too, a misconfigured server does not stall the uploads
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _post(self, body: bytes, headers: dict):
+        self.requests += 1
+        async with self._session.post(self.server_url, data=body, headers=headers) as resp:
+            if resp.status in RETRY_STATUSES:
+                raise UploadError(f"Server responded {resp.status}", parse_retry_after(resp.headers.get('Retry-After')))
+            resp.raise_for_status()
+            await resp.read()
+
+    async def send(self, batch: List[bytes]) -> bool:
+        body, headers = self._body(batch)
+        for attempt in range(self.retries + 1):
+            started_at = time.time()
+            try:
+                await self._post(body, headers)
+                self.sent += len(batch)
+                logger.debug(f"Uploaded {len(batch)} posts in {time.time() - started_at:.3f}s")
+                return True
+            except (UploadError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                if isinstance(ex, aiohttp.ClientResponseError) or attempt == self.retries:
+                    logger.error(f"Failed to upload {len(batch)} posts with error: {ex}")
+                    break
+                delay = self._backoff(attempt, getattr(ex, 'retry_after', None))
+                logger.info(f"Upload attempt {attempt + 1} failed with error: {ex}, retry in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self.failed += len(batch)
+        return False
+
+    async def _send_batch(self, batch: List[Tuple[Optional[str], bytes]]):
+        ok = False
+        try:
+            ok = await self.send([encoded for _, encoded in batch])
+        except Exception as ex:
+            logger.exception(f"Error at upload batch: {ex}")
+            self.failed += len(batch)
+        try:
+            # every batch reports its outcome, so the ledger does not keep its keys pending
+            if self.on_result is not None:
+                self.on_result([key for key, _ in batch], ok)
+        except Exception as ex:
+            logger.exception(f"Error at upload result: {ex}")
+        finally:
+            self._semaphore.release()
@@ -11,7 +11,9 @@ def main() -> None:
                         'pydantic',
                         'blinker',
                         'ruamel.yaml',
-                        'appdirs']
+                        'appdirs',
+                        'lxml',
+                        'psutil']
 
     setuptools.setup(
         name="scraper",